@@ -2,18 +2,36 @@
 对话相关API
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.config import settings
+from app.services.asr_scheduler import ASRScheduler
+from app.services.conversation_memory import ConversationMemory
 from app.services.groq_service import GroqService
-from app.services.tts_service import TTSService
+from app.services.shared import database
+from app.services.text_utils import split_sentences
+from app.services.tts_service import SentenceSplitter, TTSService
+import asyncio
 import base64
 import json
+import struct
+import uuid
+from typing import List, Optional
 
 # 延迟导入Whisper
 try:
     from app.services.whisper_service import WhisperService
-    whisper_service = WhisperService()
+    # 多个模型副本（faster-whisper的num_workers），不同批次可以真正并行
+    whisper_service = WhisperService(
+        num_workers=settings.asr_max_workers,
+        cpu_threads=settings.asr_cpu_threads,
+        beam_size=settings.asr_beam_size
+    )
+    # 所有会话共享的识别调度器：短时间窗口内的语音合成一批解码
+    asr_scheduler = ASRScheduler(whisper_service)
+    from app.services.streaming_asr import StreamingRecognizer
     WHISPER_AVAILABLE = True
 except ImportError:
     whisper_service = None
+    asr_scheduler = None
     WHISPER_AVAILABLE = False
     print("警告: faster-whisper未安装，语音识别功能将不可用")
 
@@ -21,161 +39,473 @@ router = APIRouter()
 groq_service = GroqService()
 tts_service = TTSService()
 
-# 存储对话历史
-conversation_histories = {}
+WELCOME_PROMPT = "Hello, I'm ready to practice."
+
+# 二进制音频帧（init时 binary_audio=true 协商启用）
+# 4字节头：类型(1字节) + 标志(1字节，保留) + 序号(2字节，大端)，其后为音频负载
+FRAME_HEADER = struct.Struct(">BBH")
+FRAME_USER_AUDIO = 0x01  # 客户端 -> 服务端：一整句语音（等同 user_audio）
+FRAME_AUDIO_FRAME = 0x02  # 客户端 -> 服务端：流式16位PCM（等同 audio_frame）
+FRAME_AUDIO_END = 0x03  # 客户端 -> 服务端：结束当前这句话（等同 audio_end），无负载
+FRAME_AI_AUDIO = 0x11  # 服务端 -> 客户端：逐句合成的MP3，序号即 ai_audio_chunk 的 index
+
+# 流式PCM支持的采样率（VAD按30ms分帧，识别前统一重采样到16kHz）
+SUPPORTED_SAMPLE_RATES = (8000, 16000, 24000, 32000, 44100, 48000)
+
+WHISPER_UNAVAILABLE_MESSAGE = "Whisper未安装，请使用文字输入或运行: pip install faster-whisper"
+
+class ConversationSession:
+    """单个WebSocket连接的对话状态"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.conversation_id = f"conv_{uuid.uuid4().hex}"
+        self.episode_id = None
+        # 会话记录是否已写入数据库
+        self.persisted = False
+        # 进行中的数据库写入（关闭连接时不取消，保证已完成的轮次落盘）
+        self.pending_writes = set()
+        # 对话历史：最近几轮原样保留，更早的在后台折叠成摘要
+        self.memory = ConversationMemory(groq_service)
+        self.segment_text = ""
+        # 系统提示词在init时构建一次，之后每轮直接复用
+        self.system_prompt = None
+        # 流式模式：逐段推送 ai_message_delta，最后仍发送完整的 ai_message
+        self.stream = False
+        # 分句语音流水线：逐句推送 ai_audio_chunk，不再生成整段音频文件
+        self.tts_stream = False
+        # 流式文本和语音由不同协程发送，发送需要串行
+        self.send_lock = asyncio.Lock()
+        # 音频是否走二进制帧（省去base64膨胀和JSON解析）
+        self.binary_audio = False
+        # 流式语音识别（audio_frame），首帧到达时创建
+        self.recognizer = None
+        self.audio_sample_rate = 16000
+        self.voice = "nova"
+        # 限制每个会话同时处理的轮次，默认1个，保证回复顺序与历史一致
+        self.turn_slots = asyncio.Semaphore(settings.session_max_inflight_turns)
+        self.tasks = set()
+
+    async def send(self, payload: dict):
+        async with self.send_lock:
+            await self.websocket.send_json(payload)
+
+    async def send_audio_frame(self, payload: dict, audio: bytes):
+        """发送元数据JSON帧后紧跟二进制音频帧（两帧之间不会插入其他消息）"""
+        async with self.send_lock:
+            await self.websocket.send_json(payload)
+            await self.websocket.send_bytes(
+                FRAME_HEADER.pack(FRAME_AI_AUDIO, 0, payload["index"] & 0xFFFF) + audio
+            )
+
+    async def transcribe(self, audio_data: bytes) -> str:
+        """交给共享的识别调度器，与其他会话的语音一起批量解码"""
+        return await asr_scheduler.transcribe(audio_data)
+
+    def prepare(self, segment_text: str, language_points: Optional[List[str]] = None):
+        """设置播客片段并预先构建本会话的系统提示词"""
+        self.segment_text = segment_text
+        self.system_prompt = groq_service.generate_role_play_prompt(
+            segment_text,
+            user_role="learner",
+            language_points=language_points
+        )
+
+    async def restore(self, conversation_id: str) -> bool:
+        """
+        按客户端提供的会话ID恢复之前的对话历史
+
+        Returns:
+            是否找到了已保存的会话
+        """
+        self.conversation_id = conversation_id
+        stored = await asyncio.to_thread(database.get_session, conversation_id)
+        if not stored:
+            return False
+        self.memory.restore(stored["messages"], stored["summary"], stored["summarized_count"])
+        self.persisted = True
+        return True
+
+    def _write_turn(self, turn: List[dict], summary: str, summarized_count: int):
+        if not self.persisted:
+            database.save_session(self.conversation_id, self.segment_text, self.episode_id)
+            self.persisted = True
+        database.append_messages(self.conversation_id, turn, summary, summarized_count)
+
+    async def persist_turn(self, user_text: str, ai_response: str):
+        """把一轮对话写入数据库（在线程中执行，不阻塞事件循环）"""
+        turn = [
+            {"role": "user", "content": user_text},
+            {"role": "assistant", "content": ai_response}
+        ]
+        try:
+            await asyncio.to_thread(
+                self._write_turn, turn, self.memory.summary, self.memory.summarized_count
+            )
+        except Exception as e:
+            print(f"⚠️ 对话保存失败: {e}")
+
+    async def reply(self, user_text: str, voice: str):
+        """生成AI回复、语音并发送"""
+        if self.system_prompt is None:
+            self.prepare(self.segment_text)
+        system_prompt = self.system_prompt
+
+        # 分句语音：回复的每一句一出来就开始合成
+        sentence_queue = None
+        audio_task = None
+        if self.tts_stream and tts_service.async_client:
+            sentence_queue = asyncio.Queue()
+            audio_task = asyncio.create_task(self.stream_audio(sentence_queue, voice))
+
+        try:
+            if self.stream:
+                ai_response = await self.stream_reply(user_text, system_prompt, sentence_queue)
+            else:
+                ai_response = await groq_service.agenerate_response(
+                    user_message=user_text,
+                    system_prompt=system_prompt,
+                    conversation_history=self.memory.messages()
+                )
+        except Exception:
+            if audio_task:
+                audio_task.cancel()
+            raise
+
+        # 更新对话历史
+        self.memory.append(user_text, ai_response)
+        write = asyncio.create_task(self.persist_turn(user_text, ai_response))
+        self.pending_writes.add(write)
+        write.add_done_callback(self.pending_writes.discard)
+
+        if audio_task:
+            # 非流式时文本先发出去，再开始合成，语音分块一定在 ai_message 之后到达；
+            # 流式时语音在生成过程中就已开始推送，ai_message 可能夹在语音分块之间
+            await self.send({
+                "type": "ai_message",
+                "text": ai_response,
+                "audio_url": None,
+                "audio_streamed": True
+            })
+            if not self.stream:
+                for sentence in split_sentences(ai_response):
+                    sentence_queue.put_nowait(sentence)
+            sentence_queue.put_nowait(None)
+            await audio_task
+            return
+
+        # 生成语音
+        audio_url = await tts_service.generate_speech(ai_response, voice=voice)
+
+        # 发送AI回复
+        await self.send({
+            "type": "ai_message",
+            "text": ai_response,
+            "audio_url": audio_url
+        })
+
+    async def stream_reply(
+        self,
+        user_text: str,
+        system_prompt: str,
+        sentence_queue: asyncio.Queue = None
+    ) -> str:
+        """
+        边生成边推送 ai_message_delta，返回完整回复
+        
+        传入sentence_queue时，每凑齐一句就放入队列交给语音流水线
+        """
+        parts = []
+        splitter = SentenceSplitter()
+        async for delta in groq_service.astream_response(
+            user_message=user_text,
+            system_prompt=system_prompt,
+            conversation_history=self.memory.messages()
+        ):
+            parts.append(delta)
+            await self.send({
+                "type": "ai_message_delta",
+                "text": delta
+            })
+            if sentence_queue is not None:
+                for sentence in splitter.feed(delta):
+                    sentence_queue.put_nowait(sentence)
+        if sentence_queue is not None:
+            for sentence in splitter.flush():
+                sentence_queue.put_nowait(sentence)
+        return "".join(parts)
+
+    async def stream_audio(self, sentence_queue: asyncio.Queue, voice: str):
+        """
+        按顺序推送逐句合成的语音
+        
+        先发送 {"type": "ai_audio_start"}（早于本轮的所有语音分块），
+        帧格式：{"type": "ai_audio_chunk", "index", "text", "audio"(base64 MP3)}，
+        全部发送完后发送 {"type": "ai_audio_end", "count"}
+        """
+        async def sentences():
+            while True:
+                sentence = await sentence_queue.get()
+                if sentence is None:
+                    return
+                yield sentence
+
+        await self.send({"type": "ai_audio_start"})
+        count = 0
+        try:
+            async for index, sentence, audio in tts_service.stream_speech(sentences(), voice=voice):
+                if self.binary_audio:
+                    await self.send_audio_frame({
+                        "type": "ai_audio_chunk",
+                        "index": index,
+                        "text": sentence,
+                        "format": "mp3",
+                        "binary": True
+                    }, audio)
+                else:
+                    await self.send({
+                        "type": "ai_audio_chunk",
+                        "index": index,
+                        "text": sentence,
+                        "audio": base64.b64encode(audio).decode(),
+                        "format": "mp3"
+                    })
+                count += 1
+        except Exception as e:
+            print(f"TTS Generation Error: {e}")
+        await self.send({
+            "type": "ai_audio_end",
+            "count": count
+        })
+
+    async def handle_audio(self, audio_data: bytes, voice: str):
+        """识别用户语音后回复"""
+        user_text = await self.transcribe(audio_data)
+
+        if not user_text.strip():
+            await self.send({
+                "type": "error",
+                "message": "无法识别语音，请重试"
+            })
+            return
+
+        await self.reply(user_text, voice)
+
+    def feed_audio_frame(self, pcm: bytes):
+        """
+        流式语音输入：喂入一帧16位PCM
+        
+        说话期间推送 partial_transcript，检测到说完后推送 user_transcript 并自动开始回复
+        """
+        if self.recognizer is None:
+            self.recognizer = StreamingRecognizer(
+                transcribe=self.transcribe,
+                on_partial=self.on_partial_transcript,
+                on_final=self.on_final_transcript,
+                sample_rate=self.audio_sample_rate
+            )
+        self.recognizer.feed(pcm)
+
+    def end_utterance(self):
+        """客户端主动结束当前这句话"""
+        if self.recognizer:
+            self.recognizer.finish()
+
+    async def on_partial_transcript(self, text: str):
+        await self.send({
+            "type": "partial_transcript",
+            "text": text
+        })
+
+    async def on_final_transcript(self, text: str):
+        if not text:
+            await self.send({
+                "type": "error",
+                "message": "无法识别语音，请重试"
+            })
+            return
+        await self.send({
+            "type": "user_transcript",
+            "text": text
+        })
+        self.spawn(self.reply(text, self.voice))
+
+    def spawn(self, coro):
+        """在后台执行一轮对话，接收循环不必等待本轮结束"""
+        task = asyncio.create_task(self._run_turn(coro))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run_turn(self, coro):
+        async with self.turn_slots:
+            try:
+                await coro
+            except Exception as e:
+                print(f"WebSocket Error: {e}")  # 打印错误到终端
+                try:
+                    await self.send({
+                        "type": "error",
+                        "message": str(e)
+                    })
+                except Exception:
+                    pass
+
+    def close(self):
+        self.memory.close()
+        if self.recognizer:
+            self.recognizer.close()
+        for task in list(self.tasks):
+            task.cancel()
+
+@router.get("/api/tts/cache/stats")
+async def tts_cache_stats():
+    """语音缓存统计（命中率、占用字节数、淘汰次数）"""
+    return tts_service.cache_stats()
+
+@router.get("/api/asr/stats")
+async def asr_stats():
+    """语音识别调度统计（批次数、平均批大小、排队数）"""
+    if not asr_scheduler:
+        return {"available": False}
+    return {"available": True, **asr_scheduler.stats()}
+
+async def _handle_binary_frame(session: ConversationSession, data: bytes):
+    """处理客户端发来的二进制音频帧"""
+    if len(data) < FRAME_HEADER.size:
+        await session.send({
+            "type": "error",
+            "message": "无效的音频帧"
+        })
+        return
+    kind, _, _ = FRAME_HEADER.unpack_from(data)
+    payload = data[FRAME_HEADER.size:]
+
+    if not WHISPER_AVAILABLE:
+        await session.send({
+            "type": "error",
+            "message": WHISPER_UNAVAILABLE_MESSAGE
+        })
+        return
+
+    if kind == FRAME_USER_AUDIO:
+        session.spawn(session.handle_audio(payload, session.voice))
+    elif kind == FRAME_AUDIO_FRAME:
+        session.feed_audio_frame(payload)
+    elif kind == FRAME_AUDIO_END:
+        session.end_utterance()
+    else:
+        await session.send({
+            "type": "error",
+            "message": f"未知的音频帧类型: {kind}"
+        })
 
 @router.websocket("/ws/conversation")
 async def websocket_conversation(websocket: WebSocket):
     await websocket.accept()
-    conversation_id = None
-    conversation_history = []
-    segment_text = ""
+    session = ConversationSession(websocket)
 
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            if received.get("bytes") is not None:
+                await _handle_binary_frame(session, received["bytes"])
+                continue
+            message = json.loads(received["text"])
 
             if message["type"] == "init":
                 # 初始化对话
-                conversation_id = f"conv_{id(websocket)}"
-                segment_text = message.get("segment_text", "")
-                voice = message.get("voice", "nova")  # 获取声音偏好
-                
-                # 生成系统提示词
-                system_prompt = groq_service.generate_role_play_prompt(
-                    segment_text,
-                    user_role="learner"
-                )
-                
-                # 发送欢迎消息
-                welcome_message = groq_service.generate_response(
-                    user_message="Hello, I'm ready to practice.",
-                    system_prompt=system_prompt,
-                    conversation_history=[]
+                try:
+                    sample_rate = int(message.get("sample_rate", 16000))
+                except (TypeError, ValueError):
+                    sample_rate = None
+                if sample_rate not in SUPPORTED_SAMPLE_RATES:
+                    await session.send({
+                        "type": "error",
+                        "message": f"不支持的采样率: {message.get('sample_rate')}，"
+                                   f"可选 {', '.join(map(str, SUPPORTED_SAMPLE_RATES))}"
+                    })
+                    continue
+
+                session.episode_id = message.get("episode_id")
+                session.prepare(
+                    message.get("segment_text", ""),
+                    message.get("language_points") or None
                 )
-                
-                # 更新对话历史
-                conversation_history.append({
-                    "role": "user",
-                    "content": "Hello, I'm ready to practice."
-                })
-                conversation_history.append({
-                    "role": "assistant",
-                    "content": welcome_message
-                })
-                
-                # 生成语音
-                audio_url = await tts_service.generate_speech(welcome_message, voice=voice)
-                
-                await websocket.send_json({
-                    "type": "ai_message",
-                    "text": welcome_message,
-                    "audio_url": audio_url
-                })
+                # 客户端带上之前的会话ID时恢复历史（例如断线重连、服务重启之后）
+                restored = False
+                if message.get("conversation_id"):
+                    restored = await session.restore(str(message["conversation_id"]))
+                voice = message.get("voice", "nova")  # 获取声音偏好
+                session.voice = voice
+                session.audio_sample_rate = sample_rate
+                session.stream = bool(message.get("stream", False))
+                session.tts_stream = bool(message.get("tts_stream", False))
+
+                # 回传会话ID（断线重连时带上它恢复会话）；
+                # 客户端声明支持二进制音频帧时一并确认启用，老客户端不受影响
+                ack = {
+                    "type": "init_ack",
+                    "conversation_id": session.conversation_id,
+                    "restored": restored
+                }
+                if message.get("binary_audio"):
+                    session.binary_audio = True
+                    ack["binary_audio"] = True
+                await session.send(ack)
+
+                # 发送欢迎消息（恢复的会话直接继续，不再重新打招呼）
+                if not restored:
+                    session.spawn(session.reply(WELCOME_PROMPT, voice))
 
             elif message["type"] == "user_audio":
                 # 处理用户音频
                 if not WHISPER_AVAILABLE:
-                    await websocket.send_json({
+                    await session.send({
                         "type": "error",
-                        "message": "Whisper未安装，请使用文字输入或运行: pip install faster-whisper"
+                        "message": WHISPER_UNAVAILABLE_MESSAGE
                     })
                     continue
-                
+
                 audio_base64 = message.get("audio", "")
                 audio_data = base64.b64decode(audio_base64)
-                
-                # 使用Whisper识别
-                user_text = whisper_service.transcribe_realtime(audio_data)
-                
-                if not user_text.strip():
-                    await websocket.send_json({
+                voice = message.get("voice", "nova")
+
+                session.spawn(session.handle_audio(audio_data, voice))
+
+            elif message["type"] in ("audio_frame", "audio_end"):
+                # 流式语音：audio_frame携带base64编码的16位单声道PCM（采样率见init的sample_rate），
+                # 服务端自动断句；audio_end可让客户端主动结束当前这句话
+                if not WHISPER_AVAILABLE:
+                    await session.send({
                         "type": "error",
-                        "message": "无法识别语音，请重试"
+                        "message": WHISPER_UNAVAILABLE_MESSAGE
                     })
                     continue
 
-                # 生成AI回复
-                system_prompt = groq_service.generate_role_play_prompt(
-                    segment_text,
-                    user_role="learner"
-                )
-                
-                ai_response = groq_service.generate_response(
-                    user_message=user_text,
-                    system_prompt=system_prompt,
-                    conversation_history=conversation_history
-                )
-
-                # 更新对话历史
-                conversation_history.append({
-                    "role": "user",
-                    "content": user_text
-                })
-                conversation_history.append({
-                    "role": "assistant",
-                    "content": ai_response
-                })
-
-                # 生成语音
-                voice = message.get("voice", "nova")
-                audio_url = await tts_service.generate_speech(ai_response, voice=voice)
-                
-                # 发送AI回复
-                await websocket.send_json({
-                    "type": "ai_message",
-                    "text": ai_response,
-                    "audio_url": audio_url
-                })
-
+                session.voice = message.get("voice", session.voice)
+                if message["type"] == "audio_frame":
+                    session.feed_audio_frame(base64.b64decode(message.get("audio", "")))
+                else:
+                    session.end_utterance()
             elif message["type"] == "user_message":
                 # 处理用户文字消息
                 user_text = message.get("text", "")
                 voice = message.get("voice", "nova")
-                
+
                 if not user_text.strip():
                     continue
 
-                # 生成AI回复
-                system_prompt = groq_service.generate_role_play_prompt(
-                    segment_text,
-                    user_role="learner"
-                )
-                
-                ai_response = groq_service.generate_response(
-                    user_message=user_text,
-                    system_prompt=system_prompt,
-                    conversation_history=conversation_history
-                )
-
-                # 更新对话历史
-                conversation_history.append({
-                    "role": "user",
-                    "content": user_text
-                })
-                conversation_history.append({
-                    "role": "assistant",
-                    "content": ai_response
-                })
-
-                # 生成语音
-                audio_url = await tts_service.generate_speech(ai_response, voice=voice)
-
-                # 发送AI回复
-                await websocket.send_json({
-                    "type": "ai_message",
-                    "text": ai_response,
-                    "audio_url": audio_url
-                })
+                session.spawn(session.reply(user_text, voice))
 
     except WebSocketDisconnect:
-        # 清理对话历史
-        if conversation_id:
-            conversation_histories.pop(conversation_id, None)
+        pass
     except Exception as e:
         print(f"WebSocket Error: {e}")  # 打印错误到终端
         await websocket.send_json({
             "type": "error",
             "message": str(e)
         })
+    finally:
+        session.close()
@@ -2,18 +2,33 @@
 反馈相关API
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from app.config import settings
 from app.services.groq_service import GroqService
+from app.services.shared import database, takeaway_index
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
+import hashlib
 
 router = APIRouter()
 groq_service = GroqService()
 
+# 播客片段的Takeaways只取决于片段内容：按片段哈希缓存（LRU），热门片段不再重复调用LLM
+_podcast_takeaway_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+# 正在生成中的片段，同一片段的并发请求共用一次调用
+_podcast_takeaway_pending: Dict[str, asyncio.Future] = {}
+
 class FeedbackRequest(BaseModel):
     conversation_id: str
     segment_text: str
     conversation_history: List[Dict[str, str]] = []
+    # 片段所属单集及时间范围：入库时已预先提取Takeaways的，直接查索引
+    episode_id: Optional[str] = None
+    segment_start: Optional[float] = None
+    segment_end: Optional[float] = None
 
 import json
 
@@ -25,44 +40,75 @@ class FeedbackResponse(BaseModel):
     feedback_content: FeedbackContent
     created_at: str
 
-@router.post("/generate", response_model=FeedbackResponse)
-async def generate_feedback(request: FeedbackRequest):
+def _parse_json(response: str) -> Dict:
+    return json.loads(response.replace("```json", "").replace("```", "").strip())
+
+async def get_podcast_takeaways(segment_text: str) -> List[str]:
     """
-    生成学习反馈 - 精简版：3-5条值得复述的Takeaways
+    播客片段的Takeaways（按片段内容缓存）
+
+    解析失败的空结果不缓存，下次请求会重试
     """
+    text = segment_text[:2500]
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    cached = _podcast_takeaway_cache.get(key)
+    if cached is not None:
+        _podcast_takeaway_cache.move_to_end(key)
+        return cached
+
+    pending = _podcast_takeaway_pending.get(key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise  # 是本请求自己被取消
+            # 负责生成的请求被取消（例如客户端断开），由本请求重新生成
+            return await get_podcast_takeaways(segment_text)
+
+    future = asyncio.get_running_loop().create_future()
+    _podcast_takeaway_pending[key] = future
     try:
-        history_text = "\n".join([f"{msg['role'].upper()}: {msg['text']}" for msg in request.conversation_history])
-        
-        # 1. Generate Podcast Takeaways (Source material)
-        # We increase the context window to skip potential intros
-        podcast_prompt = f"""Task: Extract 3 distinct, high-value, NATIVE English sentences from the text below.
-        
-        CRITICAL FILTERS (Do NOT extract these):
-        - NO Ads, App promotions, or "Subscribe" messages.
-        - NO Host introductions ("I'm Lindsay", "This is All Ears English").
-        - NO Generic show mottos ("Connection not perfection").
-        
-        TARGET CONTENT:
-        - Phrasal verbs in context.
-        - Idiomatic expressions used in the discussion.
-        - Opinions or specific topic details.
-        
-        Text (Scan for the actual conversation):
-        {request.segment_text[:2500]} 
-        
-        Output JSON: {{ "podcast_takeaways": ["Sentence 1", "Sentence 2", "Sentence 3"] }}"""
-        
-        podcast_response = groq_service.generate_response(
-            user_message=podcast_prompt,
-            system_prompt="You are a linguistic filter. Extract only conversational substance. Output valid JSON.",
-            conversation_history=[]
+        takeaways = await groq_service.aextract_takeaways(text)
+    except Exception as e:
+        future.set_exception(e)
+        # 避免没有其他等待者时出现 "exception was never retrieved"
+        future.exception()
+        raise
+    else:
+        future.set_result(takeaways)
+    finally:
+        # 被取消时（CancelledError不是Exception）也要结束future，否则等待者永远挂起
+        if not future.done():
+            future.cancel()
+        _podcast_takeaway_pending.pop(key, None)
+
+    if takeaways:
+        _podcast_takeaway_cache[key] = takeaways
+        while len(_podcast_takeaway_cache) > settings.feedback_takeaway_cache_size:
+            _podcast_takeaway_cache.popitem(last=False)
+    return takeaways
+
+async def resolve_podcast_takeaways(request: FeedbackRequest) -> List[str]:
+    """优先查预先构建的Takeaways索引，索引未就绪时按片段文本现场提取"""
+    if request.episode_id and request.segment_start is not None and request.segment_end is not None:
+        # 可能要读取索引文件，放到线程池中执行，不阻塞事件循环
+        takeaways = await run_in_threadpool(
+            takeaway_index.lookup, request.episode_id, request.segment_start, request.segment_end
         )
-        
-        # 2. Generate Conversation Corrections (User performance)
-        # Only if there is meaningful history
-        user_takeaways = []
-        if len(request.conversation_history) > 2:
-            conv_prompt = f"""Task: Identify 3 user errors or unnatural phrasings from the conversation.
+        if takeaways:
+            return takeaways
+    return await get_podcast_takeaways(request.segment_text)
+
+async def get_user_takeaways(conversation_history: List[Dict[str, str]]) -> List[str]:
+    """对话中用户表达的改进建议（对话太短时为空）"""
+    # Only if there is meaningful history
+    if len(conversation_history) <= 2:
+        return []
+
+    history_text = "\n".join([f"{msg['role'].upper()}: {msg['text']}" for msg in conversation_history])
+    conv_prompt = f"""Task: Identify 3 user errors or unnatural phrasings from the conversation.
             Rules:
             1. REPHRASE the user's intent into perfect Native English.
             2. Format: "Native Sentence. (Better than: 'User's error')"
@@ -73,24 +119,29 @@ async def generate_feedback(request: FeedbackRequest):
             {history_text}
             
             Output JSON: {{ "user_takeaways": ["Correction 1", "Correction 2", "Correction 3"] }}"""
-             
-            conv_response = groq_service.generate_response(
-                user_message=conv_prompt,
-                system_prompt="You are a harsh but helpful native speaker coach. Output valid JSON only.",
-                conversation_history=[]
-            )
-            try:
-                user_data = json.loads(conv_response.replace("```json", "").replace("```", "").strip())
-                user_takeaways = user_data.get("user_takeaways", [])
-            except:
-                pass
+     
+    conv_response = await groq_service.agenerate_response(
+        user_message=conv_prompt,
+        system_prompt="You are a harsh but helpful native speaker coach. Output valid JSON only.",
+        conversation_history=[]
+    )
+    try:
+        return _parse_json(conv_response).get("user_takeaways", [])
+    except:
+        return []
 
-        # 3. Parse and Combine
-        try:
-            pod_data = json.loads(podcast_response.replace("```json", "").replace("```", "").strip())
-            pod_takeaways = pod_data.get("podcast_takeaways", [])
-        except:
-            pod_takeaways = []
+@router.post("/generate", response_model=FeedbackResponse)
+async def generate_feedback(request: FeedbackRequest):
+    """
+    生成学习反馈 - 精简版：3-5条值得复述的Takeaways
+    """
+    try:
+        # 1. Podcast Takeaways (Source material) and 2. Conversation Corrections (User performance)
+        # 两次LLM调用并发进行，播客部分命中缓存时只需等待一次调用
+        pod_takeaways, user_takeaways = await asyncio.gather(
+            resolve_podcast_takeaways(request),
+            get_user_takeaways(request.conversation_history)
+        )
 
         # Final List Construction
         final_takeaways = []
@@ -116,6 +167,14 @@ async def generate_feedback(request: FeedbackRequest):
                  "🎧 Practice makes progress."
              ]
 
+        # 保存反馈（失败不影响本次返回）
+        try:
+            await asyncio.to_thread(
+                database.save_feedback, request.conversation_id, final_takeaways, request.episode_id
+            )
+        except Exception as e:
+            print(f"⚠️ 反馈保存失败: {e}")
+
         return FeedbackResponse(
             conversation_id=request.conversation_id,
             feedback_content=FeedbackContent(takeaways=final_takeaways),
@@ -130,3 +189,18 @@ async def generate_feedback(request: FeedbackRequest):
             feedback_content=FeedbackContent(takeaways=["⚠️ System error generating feedback. Please try again."]),
             created_at=datetime.now().isoformat()
         )
+
+
+@router.get("/{conversation_id}", response_model=FeedbackResponse)
+async def get_feedback(conversation_id: str):
+    """
+    读取某次对话已生成的反馈
+    """
+    stored = await asyncio.to_thread(database.get_feedback, conversation_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="反馈不存在")
+    return FeedbackResponse(
+        conversation_id=conversation_id,
+        feedback_content=FeedbackContent(takeaways=stored["takeaways"]),
+        created_at=datetime.fromtimestamp(stored["created_at"]).isoformat()
+    )
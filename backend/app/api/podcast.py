@@ -1,13 +1,32 @@
 """
 播客相关API
 """
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
-from app.services.podcast_service import PodcastService
+from typing import List, Dict, Optional
+from app.config import settings
+from app.services.feed_watcher import FeedWatcher
+from app.services.ingest_jobs import IngestJobManager, IngestQueueFullError
+from app.services.sentence_index import SentenceIndexCache
+from app.services.shared import database, podcast_service, takeaway_index
 
 router = APIRouter()
-podcast_service = PodcastService()
+# 按时间范围/分页查询句子用的索引（最近访问的单集常驻内存）
+sentence_indexes = SentenceIndexCache(database.get_sentences, settings.sentence_index_max_episodes)
+ingest_jobs = IngestJobManager(
+    podcast_service,
+    takeaway_index,
+    database,
+    on_episode_saved=sentence_indexes.invalidate
+)
+# 订阅的feed有新单集时提前处理（在应用启动时开始）
+feed_watcher = FeedWatcher(podcast_service, ingest_jobs)
+
+# 分页查询句子时每页的最大条数
+MAX_PAGE_SIZE = 1000
 
 class PodcastRequest(BaseModel):
     url: str
@@ -17,21 +36,193 @@ class PodcastResponse(BaseModel):
     audio_url: str
     sentences: List[Dict]
     duration: float
+    episode_id: Optional[str] = None
+    sentence_count: Optional[int] = None
+
+class EpisodeResponse(BaseModel):
+    episode_id: str
+    title: str
+    audio_url: str
+    duration: float
+    sentence_count: int
+
+class SentencePageResponse(BaseModel):
+    episode_id: str
+    total: int  # 单集的句子总数
+    offset: int  # 本页第一句在整集中的下标
+    sentences: List[Dict]  # [{"index", "text", "start", "end"}, ...]
+
+class JobResponse(BaseModel):
+    job_id: str
+    url: str
+    status: str
+    stage: str
+    progress: float
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    result: Optional[PodcastResponse] = None
+
+def _to_podcast_response(result: Dict, include_sentences: bool = True) -> PodcastResponse:
+    return PodcastResponse(
+        title=result["title"],
+        audio_url=result["audio_url"],
+        sentences=result["sentences"].to_segments() if include_sentences else [],
+        duration=result["duration"],
+        episode_id=result.get("episode_id"),
+        sentence_count=len(result["sentences"])
+    )
+
+def _to_job_response(job, include_sentences: bool = True) -> JobResponse:
+    data = job.to_dict()
+    if job.result is not None:
+        data["result"] = _to_podcast_response(job.result, include_sentences)
+    return JobResponse(**data)
+
+def _submit(url: str):
+    try:
+        return ingest_jobs.submit(url)
+    except IngestQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
 @router.post("/process", response_model=PodcastResponse)
-async def process_podcast(request: PodcastRequest):
+async def process_podcast(request: PodcastRequest, include_sentences: bool = True):
     """
     处理播客链接
     
     接收播客URL，下载音频，转写文字，返回句子列表
+    （在后台任务池中执行并等待结果，不阻塞其他请求；长时间任务建议使用 /jobs 接口）
+    
+    include_sentences=false 时只返回单集信息，句子通过 /episodes/{episode_id}/sentences 按需获取
     """
+    job = _submit(request.url)
     try:
-        result = podcast_service.process_podcast_url(request.url)
-        return PodcastResponse(
-            title=result["title"],
-            audio_url=result["audio_url"],
-            sentences=result["sentences"],
-            duration=result["duration"]
-        )
+        result = await asyncio.wrap_future(job.future)
+        return _to_podcast_response(result, include_sentences)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_podcast_job(request: PodcastRequest):
+    """
+    提交播客处理任务，立即返回job_id
+    
+    之后通过 GET /jobs/{job_id} 轮询，或 GET /jobs/{job_id}/events 订阅进度（SSE）
+    """
+    return _to_job_response(_submit(request.url))
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_podcast_job(job_id: str, include_sentences: bool = True):
+    """查询任务状态；完成后result中包含与 /process 相同的结果"""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return _to_job_response(job, include_sentences)
+
+@router.get("/jobs/{job_id}/events")
+async def podcast_job_events(job_id: str):
+    """
+    以Server-Sent Events推送任务进度
+    
+    每次阶段/进度变化推送一条 progress 事件，结束时推送 done 或 error 事件
+    """
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+
+    async def event_stream():
+        last_version = -1
+        while True:
+            if job.version != last_version:
+                last_version = job.version
+                yield f"event: progress\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.finished:
+                payload = _to_job_response(job).model_dump_json()
+                event = "done" if job.status == "succeeded" else "error"
+                yield f"event: {event}\ndata: {payload}\n\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.get("/jobs")
+async def podcast_job_stats():
+    """任务池状态（并发上限、运行中/排队中的任务数）"""
+    return ingest_jobs.stats()
+
+@router.get("/episodes/{episode_id}", response_model=EpisodeResponse)
+async def get_episode(episode_id: str):
+    """单集信息（不含句子）"""
+    episode = await asyncio.to_thread(database.get_episode, episode_id, False)
+    if episode is None:
+        raise HTTPException(status_code=404, detail="单集不存在")
+    return EpisodeResponse(**{key: episode[key] for key in EpisodeResponse.model_fields})
+
+@router.get("/episodes/{episode_id}/sentences", response_model=SentencePageResponse)
+async def get_episode_sentences(
+    episode_id: str,
+    start: Optional[float] = Query(None, ge=0, description="时间范围起点（秒）"),
+    end: Optional[float] = Query(None, ge=0, description="时间范围终点（秒）"),
+    page: int = Query(0, ge=0, description="页码（从0开始），未指定时间范围时使用"),
+    page_size: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    按时间范围或分页查询句子
+    
+    - 指定start/end时返回与该时间范围有重叠的句子（最多page_size条）
+    - 否则返回第page页
+    """
+    # 未命中时需要从数据库加载，放到线程中执行
+    index = await asyncio.to_thread(sentence_indexes.get, episode_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="单集不存在")
+
+    if start is not None or end is not None:
+        first, last = index.range(start or 0.0, end if end is not None else float("inf"))
+        last = min(last, first + page_size)
+    else:
+        first, last = index.page(page, page_size)
+
+    return SentencePageResponse(
+        episode_id=episode_id,
+        total=len(index),
+        offset=first,
+        sentences=[
+            {"index": i, **index.transcript[i]}
+            for i in range(first, last)
+        ]
+    )
+
+@router.get("/episodes/{episode_id}/transcript", response_model=PodcastResponse)
+async def get_episode_transcript(episode_id: str):
+    """
+    读取已处理过的单集（从数据库加载，不重新下载/转写）
+    """
+    episode = await asyncio.to_thread(database.get_episode, episode_id)
+    if episode is None:
+        raise HTTPException(status_code=404, detail="单集不存在")
+    return _to_podcast_response(episode)
+
+@router.get("/cache/stats")
+async def transcript_cache_stats():
+    """
+    转写缓存统计
+    
+    命中次数、命中率以及因命中而省下的Groq转写音频时长
+    """
+    return podcast_service.transcript_cache.stats()
+
+@router.get("/feeds/stats")
+async def feed_cache_stats():
+    """RSS feed缓存统计（TTL内命中、304重新验证、完整下载的次数）"""
+    return podcast_service.feed_cache.stats()
+
+@router.get("/watcher/stats")
+async def feed_watcher_stats():
+    """feed订阅与预处理统计"""
+    return feed_watcher.stats()
+
+@router.get("/takeaways/stats")
+async def takeaway_index_stats():
+    """Takeaways索引统计（构建中的单集数、已提取窗口数、反馈查询命中数）"""
+    return takeaway_index.stats()
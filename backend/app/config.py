@@ -2,16 +2,97 @@
 应用配置
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     """应用设置"""
     groq_api_key: str
+    groq_base_url: Optional[str] = None  # 自定义Groq API地址（代理或本地压测用的模拟服务）
     openai_api_key: Optional[str] = None
     openai_base_url: Optional[str] = None  # 支持第三方API代理
     database_url: str = "sqlite:///./talk2me.db"
     audio_storage_path: str = "./storage/audio"
     feedback_storage_path: str = "./storage/feedback"
+
+    # 转写缓存
+    transcript_cache_path: str = "./storage/transcripts"
+    transcript_cache_max_bytes: int = 200 * 1024 * 1024  # 200MB
+    transcript_cache_ttl_seconds: int = 30 * 24 * 3600  # 30天，0表示不过期
+
+    # 播客处理任务池
+    ingest_max_workers: int = 2  # 每个节点同时处理的播客数
+    ingest_max_pending: int = 20  # 排队+处理中的任务上限
+
+    # 长音频分段并行转写
+    transcribe_chunk_seconds: int = 600  # 每段时长，超过该时长的音频走分段模式；0表示关闭
+    transcribe_chunk_overlap_seconds: int = 10  # 相邻分段的重叠时长
+    transcribe_parallelism: int = 4  # 同时上传转写的分段数
+
+    # 单集转写引擎：groq（云端API）或 local（本地faster-whisper进程池，离线、无费用）
+    transcription_engine: str = "groq"
+    local_whisper_model: str = "small"
+    local_whisper_compute_type: str = "int8"
+    local_whisper_beam_size: int = 5  # 1为贪心解码，速度约快一倍
+    local_whisper_cpu_threads: int = 2  # 每个进程的CPU线程数
+    local_whisper_workers: int = 0  # 进程数（每个进程一份模型），0表示 核数 / 线程数
+    local_transcribe_chunk_seconds: int = 600  # 本地分段转写的最大窗口长度
+
+    # 音频下载
+    stream_transcode: bool = True  # 下载时通过管道同步转码出16kHz单声道的转写版本
+    download_max_resumes: int = 5  # 连接中断时最多断点续传次数
+
+    # 实时对话
+    asr_max_workers: int = 2  # 语音识别模型副本数（所有会话共享，可同时运行的批次数）
+    asr_cpu_threads: int = 0  # 每个副本的CPU线程数，0表示自动；建议 副本数 × 线程数 ≈ 核数
+    asr_beam_size: int = 5
+    asr_batch_max_size: int = 8  # 每批最多合并的语音条数
+    asr_batch_max_wait_ms: int = 30  # 凑批最多等待的时间，限制额外增加的延迟
+    session_max_inflight_turns: int = 1  # 每个会话同时处理的轮次上限
+
+    # 流式语音识别（VAD自动断句）
+    vad_endpoint_silence_ms: int = 700  # 说话后连续静音多久视为说完
+    vad_partial_interval_ms: int = 800  # 说话期间多久做一次中间识别
+    vad_max_utterance_seconds: int = 30  # 单句最长时长，超过强制结束
+    vad_min_rms: float = 300.0  # 有声判定的最小RMS（16位PCM幅度）
+    vad_noise_ratio: float = 3.0  # 有声判定阈值相对噪声基线的倍数
+
+    # 对话历史
+    history_token_budget: int = 1200  # 原样发送给LLM的历史token上限，更早的轮次折叠成摘要
+    history_keep_messages: int = 6  # 至少原样保留的最近消息数
+
+    # 语音合成（分句流水线与缓存）
+    tts_pipeline_concurrency: int = 3  # 分句语音流水线中同时合成的句子数
+    tts_cache_max_bytes: int = 200 * 1024 * 1024  # 语音缓存目录的字节上限，超过后按LRU淘汰
+
+    # 角色扮演提示词
+    role_play_segment_max_chars: int = 3000  # 角色扮演提示词中片段的最大长度，超过时只保留相关句子（0表示不裁剪）
+    role_play_prompt_cache_size: int = 128  # 缓存的角色扮演提示词数量
+
+    # 学习反馈中的播客Takeaways
+    feedback_takeaway_cache_size: int = 256  # 缓存的播客片段Takeaways数量
+    takeaway_index_path: str = "./storage/takeaways"  # 入库时预先提取的Takeaways索引目录
+    takeaway_window_chars: int = 2500  # 提取Takeaways的文本窗口长度
+    takeaway_index_workers: int = 1  # 后台提取Takeaways的并发单集数
+    takeaway_index_max_loaded: int = 128  # 常驻内存的Takeaways索引数（LRU）
+
+    # 句子时间索引
+    sentence_index_max_episodes: int = 256  # 常驻内存、可按时间范围查询句子的单集数
+
+    # RSS feed缓存与获取（多个候选源并发请求）
+    feed_cache_ttl_seconds: int = 300  # RSS feed在此时间内直接使用缓存，过期后条件请求重新验证
+    feed_cache_max_feeds: int = 64  # 缓存的RSS feed数量上限
+    feed_race_workers: int = 4  # 同时请求的候选RSS源数，最先返回有效feed的源胜出
+
+    # 共享HTTP连接池
+    http_pool_connections: int = 16  # 共享HTTP连接池缓存的主机数
+    http_pool_maxsize: int = 8  # 每个主机保持的keep-alive连接数
+
+    # 后台订阅feed，提前处理新发布的单集
+    feed_watch_urls: List[str] = []  # 订阅的feed（RSS或苹果播客链接），为空时不启动
+    feed_watch_interval_seconds: int = 1800  # 检查新单集的间隔
+    feed_watch_latest_episodes: int = 1  # 首次检查时预处理每个feed最新的几集
+    feed_watch_max_concurrent: int = 1  # 同时预处理的单集数（与用户请求共用处理任务池，应小于ingest_max_workers）
+    feed_watch_daily_budget: int = 10  # 24小时内最多预处理的单集数（控制转写费用）
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,134 @@
+"""
+语音识别调度器
+所有会话共享：在很短的时间窗口内收集各会话提交的语音，凑成一批交给Whisper批量解码，
+最多同时运行与模型副本数相同的批次，识别结果按提交顺序送回各自的会话
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from app.config import settings
+
+
+class ASRScheduler:
+    def __init__(
+        self,
+        whisper_service,
+        replicas: int = None,
+        max_batch_size: int = None,
+        max_wait_ms: int = None
+    ):
+        """
+        Args:
+            whisper_service: WhisperService实例（应以 num_workers=replicas 创建）
+            replicas: 同时运行的批次数（模型副本数）
+            max_batch_size: 每批最多包含的语音条数
+            max_wait_ms: 第一条语音到达后最多等待多久再开始解码（限制额外增加的延迟）
+        """
+        self.whisper_service = whisper_service
+        self.replicas = replicas or settings.asr_max_workers
+        self.max_batch_size = max_batch_size or settings.asr_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.asr_batch_max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=self.replicas, thread_name_prefix="asr")
+        self._queue: asyncio.Queue = None
+        self._dispatcher: asyncio.Task = None
+        self._slots: asyncio.Semaphore = None
+        # 保留运行中批次的引用，避免任务被垃圾回收
+        self._running = set()
+
+        self.batches = 0
+        self.utterances = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_started(self):
+        # 队列和调度协程需要在事件循环中创建
+        if self._dispatcher is None or self._dispatcher.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.replicas)
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def transcribe(self, audio_data: bytes, language: str = "en") -> str:
+        """
+        提交一段语音并等待识别结果
+
+        Args:
+            audio_data: 音频数据（bytes）
+            language: 语言代码
+
+        Returns:
+            识别出的文本
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio_data, language, future))
+        return await future
+
+    async def _dispatch(self):
+        while True:
+            first = await self._queue.get()
+            # 等待一个模型副本空闲，等待期间新到的语音可以并入这一批
+            await self._slots.acquire()
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[bytes, str, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            # 按语言分组，同一组一次解码
+            groups: Dict[str, List[int]] = {}
+            for index, (_, language, _) in enumerate(batch):
+                groups.setdefault(language, []).append(index)
+
+            for language, indexes in groups.items():
+                try:
+                    texts = await loop.run_in_executor(
+                        self._executor,
+                        self.whisper_service.transcribe_batch,
+                        [batch[i][0] for i in indexes],
+                        language
+                    )
+                except Exception as e:
+                    for i in indexes:
+                        if not batch[i][2].done():
+                            batch[i][2].set_exception(e)
+                    continue
+                # 单条语音的失败（例如音频无法解码）只送回对应的会话
+                for i, text in zip(indexes, texts):
+                    future = batch[i][2]
+                    if future.done():
+                        continue
+                    if isinstance(text, Exception):
+                        future.set_exception(text)
+                    else:
+                        future.set_result(text)
+        finally:
+            self._slots.release()
+            self.batches += 1
+            self.utterances += len(batch)
+            self.busy_seconds += time.monotonic() - started
+
+    def stats(self) -> Dict:
+        return {
+            "replicas": self.replicas,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": int(self.max_wait * 1000),
+            "batches": self.batches,
+            "utterances": self.utterances,
+            "avg_batch_size": round(self.utterances / self.batches, 2) if self.batches else 0.0,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "queued": self._queue.qsize() if self._queue else 0
+        }
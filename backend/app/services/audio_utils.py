@@ -0,0 +1,164 @@
+"""
+音频处理工具
+基于 ffmpeg / ffprobe 命令行：时长探测、分段切片与解码、分段转写结果拼接
+"""
+import re
+import subprocess
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def probe_duration(audio_path: str) -> float:
+    """
+    获取音频时长（秒）
+
+    Raises:
+        Exception: ffprobe执行失败
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        audio_path
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if process.returncode != 0:
+        raise Exception(f"ffprobe失败: {process.stderr.decode(errors='ignore')[:200]}")
+    return float(process.stdout.decode().strip() or 0)
+
+
+def plan_chunks(duration: float, chunk_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    """
+    把音频切成有重叠的窗口
+
+    Args:
+        duration: 音频总时长
+        chunk_seconds: 每个窗口的长度
+        overlap_seconds: 相邻窗口的重叠长度
+
+    Returns:
+        [(起点, 长度), ...]
+
+    Raises:
+        ValueError: 重叠长度不小于窗口长度（窗口无法前进）
+    """
+    if overlap_seconds < 0 or overlap_seconds >= chunk_seconds:
+        raise ValueError(f"窗口重叠 ({overlap_seconds}s) 必须小于窗口长度 ({chunk_seconds}s)")
+    if duration <= chunk_seconds:
+        return [(0.0, duration)]
+
+    step = chunk_seconds - overlap_seconds
+    chunks = []
+    start = 0.0
+    while start < duration:
+        length = min(chunk_seconds, duration - start)
+        chunks.append((start, length))
+        if start + length >= duration:
+            break
+        start += step
+    return chunks
+
+
+def extract_chunk(audio_path: str, start: float, length: float, output_path: str):
+    """
+    切出一段音频并转成Whisper需要的格式（16kHz单声道、低码率）
+
+    Raises:
+        Exception: ffmpeg执行失败
+    """
+    cmd = [
+        "ffmpeg", "-y",
+        "-ss", f"{start:.3f}",
+        "-t", f"{length:.3f}",
+        "-i", audio_path,
+        "-ac", "1",
+        "-ar", "16000",
+        "-b:a", "32k",
+        output_path
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg切片失败: {process.stderr.decode(errors='ignore')[-300:]}")
+
+
+def decode_segment(audio_path: str, start: float, length: float, sample_rate: int = 16000) -> np.ndarray:
+    """
+    解码一段音频为单声道float32数组（通过管道，不写临时文件）
+
+    Raises:
+        Exception: ffmpeg执行失败
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-ss", f"{start:.3f}",
+        "-t", f"{length:.3f}",
+        "-i", audio_path,
+        "-f", "f32le",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg解码失败: {process.stderr.decode(errors='ignore')[-300:]}")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"[^a-z0-9 ]", "", text.lower()).strip()
+
+
+def stitch_segments(chunk_results: List[Tuple[float, float, List[Dict]]]) -> List[Dict]:
+    """
+    拼接各窗口的转写结果
+
+    - 时间戳加上窗口起点，变成整段音频的绝对时间
+    - 重叠区以中点为界：前一个窗口保留中点之前开始的句子，后一个窗口保留中点之后的
+    - 边界处两个窗口转写出同一句话时去重
+
+    Args:
+        chunk_results: [(窗口起点, 窗口长度, [{"text", "start", "end"}, ...]), ...]，按起点排序，
+            句子时间相对于窗口起点
+
+    Returns:
+        句子列表 [{"text": "...", "start": 0.0, "end": 1.0}, ...]
+    """
+    # 相邻窗口重叠区的中点
+    boundaries = [
+        (chunk_results[i + 1][0] + chunk_results[i][0] + chunk_results[i][1]) / 2
+        for i in range(len(chunk_results) - 1)
+    ]
+
+    sentences: List[Dict] = []
+    for index, (offset, _, segments) in enumerate(chunk_results):
+        lower = boundaries[index - 1] if index > 0 else None
+        upper = boundaries[index] if index < len(boundaries) else None
+
+        for segment in segments:
+            text = segment["text"].strip()
+            if not text:
+                continue
+            start = segment["start"] + offset
+            end = segment["end"] + offset
+            if lower is not None and start < lower:
+                continue
+            if upper is not None and start >= upper:
+                continue
+
+            # 边界去重：和上一句时间重叠且文本相同/互相包含时只保留较完整的一句
+            if sentences and start < sentences[-1]["end"]:
+                prev_text = _normalize_text(sentences[-1]["text"])
+                cur_text = _normalize_text(text)
+                if cur_text and (cur_text in prev_text or prev_text in cur_text):
+                    if len(cur_text) > len(prev_text):
+                        sentences[-1] = {"text": text, "start": sentences[-1]["start"], "end": end}
+                    continue
+
+            sentences.append({"text": text, "start": start, "end": end})
+
+    return [
+        {"text": s["text"], "start": round(s["start"], 2), "end": round(s["end"], 2)}
+        for s in sentences
+    ]
+
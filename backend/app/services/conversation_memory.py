@@ -0,0 +1,142 @@
+"""
+对话历史管理
+按token预算控制每轮发送给LLM的历史：最近的若干轮原样保留，
+更早的轮次在后台折叠进一段滚动摘要，长对话的每轮提示词长度保持稳定
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+# 每条消息的格式开销（role等）按固定token数估算
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（英文约4个字符一个token），无需加载分词器"""
+    return len(text) // 4 + 1
+
+
+def messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        groq_service,
+        token_budget: int = None,
+        keep_messages: int = None
+    ):
+        """
+        Args:
+            groq_service: GroqService实例（用于生成摘要）
+            token_budget: 原样保留的历史消息的token上限
+            keep_messages: 无论预算如何，至少原样保留的最近消息数
+        """
+        self.groq_service = groq_service
+        self.token_budget = token_budget or settings.history_token_budget
+        self.keep_messages = keep_messages if keep_messages is not None else settings.history_keep_messages
+
+        # 完整对话记录（不发送给LLM，用于持久化/反馈）
+        self.transcript: List[Dict[str, str]] = []
+        # 尚未折叠进摘要的消息
+        self.recent: List[Dict[str, str]] = []
+        self.summary = ""
+        # 正在后台生成摘要的消息数（recent的前N条）
+        self._folding = 0
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def append(self, user_text: str, ai_response: str):
+        """记录一轮对话，超出预算时在后台开始折叠"""
+        turn = [
+            {"role": "user", "content": user_text},
+            {"role": "assistant", "content": ai_response}
+        ]
+        self.transcript.extend(turn)
+        self.recent.extend(turn)
+        self._maybe_fold()
+
+    def restore(self, transcript: List[Dict[str, str]], summary: str = "", summarized_count: int = 0):
+        """
+        从持久化的记录恢复（服务重启后继续之前的对话）
+
+        Args:
+            transcript: 完整对话记录
+            summary: 保存时的滚动摘要
+            summarized_count: 已折叠进摘要的消息数
+        """
+        if not summary:
+            summarized_count = 0
+        self.transcript = list(transcript)
+        self.recent = list(transcript[summarized_count:])
+        self.summary = summary
+        self._maybe_fold()
+
+    @property
+    def summarized_count(self) -> int:
+        """已折叠进摘要的消息数"""
+        return len(self.transcript) - len(self.recent)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        本轮要发送给LLM的历史
+
+        摘要尚未生成完时，待折叠的消息仍原样发送，保证上下文不丢失
+        """
+        history = []
+        if self.summary:
+            history.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation with this learner:\n{self.summary}"
+            })
+        history.extend(self.recent)
+        return history
+
+    def _maybe_fold(self):
+        if self._summary_task and not self._summary_task.done():
+            return
+        if messages_tokens(self.recent) <= self.token_budget:
+            return
+
+        # 从最早的消息开始折叠，直到剩余部分在预算内（成对折叠，保持user/assistant配对）
+        fold = 0
+        remaining = messages_tokens(self.recent)
+        while len(self.recent) - fold > self.keep_messages and remaining > self.token_budget:
+            remaining -= messages_tokens(self.recent[fold:fold + 2])
+            fold += 2
+        if fold == 0:
+            return
+
+        self._folding = fold
+        self._summary_task = asyncio.create_task(self._fold(fold))
+
+    async def _fold(self, count: int):
+        folded = self.recent[:count]
+        try:
+            summary = await self.groq_service.asummarize_conversation(self.summary, folded)
+        except Exception as e:
+            # 摘要失败不影响对话：这些消息继续原样保留，下一轮再试
+            print(f"⚠️ 对话摘要失败: {e}")
+            return
+        finally:
+            self._folding = 0
+
+        self.summary = summary
+        del self.recent[:count]
+        # 折叠期间又新增了很多轮时继续折叠
+        self._summary_task = None
+        self._maybe_fold()
+
+    def stats(self) -> Dict:
+        return {
+            "messages": len(self.transcript),
+            "recent_messages": len(self.recent),
+            "recent_tokens": messages_tokens(self.recent),
+            "summary_tokens": estimate_tokens(self.summary) if self.summary else 0,
+            "folding": self._folding
+        }
+
+    def close(self):
+        if self._summary_task:
+            self._summary_task.cancel()
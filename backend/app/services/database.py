@@ -0,0 +1,277 @@
+"""
+持久化存储
+基于 settings.database_url（默认SQLite）保存单集、句子、对话会话/消息和学习反馈，
+服务重启后不丢失，转写结果直接从数据库读取而不必重新生成
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    Column, Float, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, Text,
+    bindparam, create_engine, delete, event, func, insert, select, update
+)
+
+from app.config import settings
+from app.services.transcript import Transcript
+
+metadata = MetaData()
+
+episodes = Table(
+    "episodes", metadata,
+    Column("id", String(64), primary_key=True),
+    Column("title", Text, nullable=False),
+    Column("audio_url", Text, nullable=False),
+    Column("audio_path", Text),
+    Column("source_url", Text),
+    Column("duration", Float, nullable=False, default=0.0),
+    Column("sentence_count", Integer, nullable=False, default=0),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+# 整集句子的 Transcript 二进制：加载单集时一次读出（时间范围查询由内存中的句子索引完成）
+transcripts = Table(
+    "transcripts", metadata,
+    Column("episode_id", String(64), ForeignKey("episodes.id", ondelete="CASCADE"), primary_key=True),
+    Column("data", LargeBinary, nullable=False),
+)
+
+sessions = Table(
+    "sessions", metadata,
+    Column("id", String(64), primary_key=True),
+    Column("episode_id", String(64), index=True),
+    Column("segment_text", Text, nullable=False, default=""),
+    Column("summary", Text, nullable=False, default=""),
+    # 已折叠进摘要的消息数（恢复会话时这些消息不再原样发送给LLM）
+    Column("summarized_count", Integer, nullable=False, default=0),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+messages = Table(
+    "messages", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("session_id", String(64), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False),
+    Column("seq", Integer, nullable=False),
+    Column("role", String(16), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Index("ix_messages_session_seq", "session_id", "seq", unique=True),
+)
+
+feedback = Table(
+    "feedback", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("conversation_id", String(64), nullable=False, index=True),
+    Column("episode_id", String(64), index=True),
+    Column("takeaways", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+)
+
+# 常用查询预先构建好，SQLAlchemy会缓存编译结果，每次调用只绑定参数
+_SELECT_EPISODE = select(episodes).where(episodes.c.id == bindparam("episode_id"))
+_SELECT_TRANSCRIPT = select(transcripts.c.data).where(transcripts.c.episode_id == bindparam("episode_id"))
+_SELECT_SESSION = select(sessions).where(sessions.c.id == bindparam("session_id"))
+_SELECT_MESSAGES = (
+    select(messages.c.role, messages.c.content)
+    .where(messages.c.session_id == bindparam("session_id"))
+    .order_by(messages.c.seq)
+)
+_SELECT_LAST_SEQ = (
+    select(func.coalesce(func.max(messages.c.seq), -1))
+    .where(messages.c.session_id == bindparam("session_id"))
+)
+_SELECT_FEEDBACK = (
+    select(feedback.c.takeaways, feedback.c.episode_id, feedback.c.created_at)
+    .where(feedback.c.conversation_id == bindparam("conversation_id"))
+    .order_by(feedback.c.id.desc())
+    .limit(1)
+)
+
+
+def _configure_sqlite(dbapi_connection, _):
+    cursor = dbapi_connection.cursor()
+    # WAL：读写互不阻塞；NORMAL在WAL下足够安全且写入快得多
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+class Database:
+    def __init__(self, database_url: str = None):
+        """
+        Args:
+            database_url: SQLAlchemy连接串，默认使用 settings.database_url
+        """
+        self.database_url = database_url or settings.database_url
+        connect_args = {}
+        if self.database_url.startswith("sqlite"):
+            # 连接会在线程池的不同线程中使用
+            connect_args["check_same_thread"] = False
+        self.engine = create_engine(self.database_url, connect_args=connect_args, pool_pre_ping=True)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", _configure_sqlite)
+        metadata.create_all(self.engine)
+        # 同一会话的消息序号需要串行分配
+        self._message_lock = threading.Lock()
+
+    # ---------- 单集与句子 ----------
+
+    def save_episode(self, result: Dict, source_url: str = None):
+        """
+        保存（或覆盖）单集及其全部句子（整集一个Transcript二进制）
+
+        Args:
+            result: process_podcast_url 的结果字典（需包含 episode_id）
+            source_url: 用户提交的原始链接
+        """
+        episode_id = result["episode_id"]
+        now = time.time()
+        transcript = result["sentences"]
+        if not isinstance(transcript, Transcript):
+            transcript = Transcript.from_segments(transcript)
+        values = {
+            "title": result["title"],
+            "audio_url": result["audio_url"],
+            "audio_path": result.get("audio_path"),
+            "source_url": source_url,
+            "duration": result["duration"],
+            "sentence_count": len(transcript),
+            "updated_at": now,
+        }
+
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(episodes).where(episodes.c.id == episode_id).values(**values)
+            ).rowcount
+            if updated:
+                conn.execute(delete(transcripts).where(transcripts.c.episode_id == episode_id))
+            else:
+                conn.execute(insert(episodes).values(id=episode_id, created_at=now, **values))
+            conn.execute(insert(transcripts).values(episode_id=episode_id, data=transcript.to_bytes()))
+
+    def get_episode(self, episode_id: str, with_sentences: bool = True) -> Optional[Dict]:
+        """
+        读取单集
+
+        Returns:
+            与 process_podcast_url 相同结构的字典（sentences为Transcript；with_sentences=False 时不含），
+            不存在返回None
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(_SELECT_EPISODE, {"episode_id": episode_id}).mappings().first()
+            if row is None:
+                return None
+            episode = {
+                "episode_id": row["id"],
+                "title": row["title"],
+                "audio_url": row["audio_url"],
+                "audio_path": row["audio_path"],
+                "duration": row["duration"],
+                "sentence_count": row["sentence_count"],
+            }
+            if with_sentences:
+                data = conn.execute(_SELECT_TRANSCRIPT, {"episode_id": episode_id}).scalar_one()
+                episode["sentences"] = Transcript.from_bytes(data)
+        return episode
+
+    def get_sentences(self, episode_id: str) -> Optional[Transcript]:
+        """读取单集的全部句子，单集不存在返回None"""
+        episode = self.get_episode(episode_id)
+        return episode["sentences"] if episode else None
+
+    # ---------- 对话会话与消息 ----------
+
+    def save_session(self, session_id: str, segment_text: str = "", episode_id: str = None):
+        """创建会话，已存在时更新片段信息"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(sessions).where(sessions.c.id == session_id)
+                .values(segment_text=segment_text, episode_id=episode_id, updated_at=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(sessions).values(
+                    id=session_id, segment_text=segment_text, episode_id=episode_id,
+                    summary="", summarized_count=0, created_at=now, updated_at=now
+                ))
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        """
+        读取会话及其全部消息
+
+        Returns:
+            {"id", "episode_id", "segment_text", "summary", "summarized_count",
+             "messages": [{"role", "content"}]}，不存在返回None
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(_SELECT_SESSION, {"session_id": session_id}).mappings().first()
+            if row is None:
+                return None
+            session = dict(row)
+            session["messages"] = [
+                {"role": role, "content": content}
+                for role, content in conn.execute(_SELECT_MESSAGES, {"session_id": session_id})
+            ]
+        return session
+
+    def append_messages(
+        self,
+        session_id: str,
+        new_messages: List[Dict[str, str]],
+        summary: str = None,
+        summarized_count: int = None
+    ):
+        """
+        追加消息（一次事务批量写入）
+
+        Args:
+            session_id: 会话ID（需已通过 save_session 创建）
+            new_messages: [{"role", "content"}, ...]
+            summary: 当前的滚动摘要，提供时一并更新
+            summarized_count: 已折叠进摘要的消息数，提供时一并更新
+        """
+        now = time.time()
+        with self._message_lock, self.engine.begin() as conn:
+            seq = conn.execute(_SELECT_LAST_SEQ, {"session_id": session_id}).scalar_one() + 1
+            if new_messages:
+                conn.execute(insert(messages), [
+                    {"session_id": session_id, "seq": seq + offset, "role": m["role"],
+                     "content": m["content"], "created_at": now}
+                    for offset, m in enumerate(new_messages)
+                ])
+            values = {"updated_at": now}
+            if summary is not None:
+                values["summary"] = summary
+            if summarized_count is not None:
+                values["summarized_count"] = summarized_count
+            conn.execute(update(sessions).where(sessions.c.id == session_id).values(**values))
+
+    # ---------- 学习反馈 ----------
+
+    def save_feedback(self, conversation_id: str, takeaways: List[str], episode_id: str = None):
+        with self.engine.begin() as conn:
+            conn.execute(insert(feedback).values(
+                conversation_id=conversation_id,
+                episode_id=episode_id,
+                takeaways=json.dumps(takeaways, ensure_ascii=False),
+                created_at=time.time()
+            ))
+
+    def get_feedback(self, conversation_id: str) -> Optional[Dict]:
+        """读取某次对话最近一次生成的反馈，不存在返回None"""
+        with self.engine.connect() as conn:
+            row = conn.execute(_SELECT_FEEDBACK, {"conversation_id": conversation_id}).first()
+        if row is None:
+            return None
+        takeaways, episode_id, created_at = row
+        return {
+            "conversation_id": conversation_id,
+            "episode_id": episode_id,
+            "takeaways": json.loads(takeaways),
+            "created_at": created_at
+        }
@@ -0,0 +1,177 @@
+"""
+RSS feed缓存
+保存解析好的feed及其 ETag / Last-Modified：TTL内直接返回，过期后用条件请求重新验证，
+feed未变化时服务器返回304，不再下载、不再解析整个feed；
+每个feed附带单集索引，按单集ID查找不用扫描整个feed
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import feedparser
+import requests
+
+from app.config import settings
+from app.services.feed_index import EpisodeIndex
+from app.services.http_client import create_session
+
+
+class CachedFeed:
+    __slots__ = ("feed", "index", "etag", "last_modified", "fetched_at", "validated_at", "size")
+
+    def __init__(self, feed, index: EpisodeIndex, etag: Optional[str], last_modified: Optional[str], size: int):
+        self.feed = feed
+        self.index = index
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time()
+        self.validated_at = self.fetched_at
+        self.size = size
+
+
+class FeedCache:
+    def __init__(self, ttl_seconds: int = None, max_feeds: int = None, session: requests.Session = None):
+        """
+        Args:
+            ttl_seconds: 多久之内直接使用缓存、不请求服务器
+            max_feeds: 缓存的feed数量上限（LRU）
+            session: 共享的HTTP连接池，为None时自己创建
+        """
+        self.session = session or create_session()
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.feed_cache_ttl_seconds
+        self.max_feeds = max_feeds or settings.feed_cache_max_feeds
+        self._feeds: "OrderedDict[str, CachedFeed]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个URL一把锁：同一feed同时只有一个请求，其他请求等它完成后直接用结果
+        self._url_locks: Dict[str, threading.Lock] = {}
+
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.fetches = 0
+        self.bytes_downloaded = 0
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            lock = self._url_locks.get(url)
+            if lock is None:
+                lock = self._url_locks[url] = threading.Lock()
+            return lock
+
+    def _lookup(self, url: str) -> Optional[CachedFeed]:
+        with self._lock:
+            cached = self._feeds.get(url)
+            if cached is not None:
+                self._feeds.move_to_end(url)
+            return cached
+
+    def _store(self, url: str, cached: CachedFeed):
+        with self._lock:
+            self._feeds[url] = cached
+            self._feeds.move_to_end(url)
+            while len(self._feeds) > self.max_feeds:
+                evicted, _ = self._feeds.popitem(last=False)
+                self._url_locks.pop(evicted, None)
+
+    def get(self, url: str, timeout: float = 60):
+        """
+        获取解析好的feed
+
+        Args:
+            url: RSS feed链接
+            timeout: 请求超时（秒）
+
+        Returns:
+            feedparser解析结果
+
+        Raises:
+            requests.RequestException: 请求失败（且没有可用的缓存）
+        """
+        return self.get_indexed(url, timeout)[0]
+
+    def get_indexed(self, url: str, timeout: float = 60) -> Tuple[object, EpisodeIndex]:
+        """
+        获取解析好的feed及其单集索引
+
+        Returns:
+            (feedparser解析结果, 单集索引)
+
+        Raises:
+            requests.RequestException: 请求失败（且没有可用的缓存）
+        """
+        cached = self._lookup(url)
+        if cached and time.time() - cached.validated_at < self.ttl_seconds:
+            self.fresh_hits += 1
+            return cached.feed, cached.index
+
+        with self._url_lock(url):
+            # 等锁期间可能已被其他请求刷新
+            cached = self._lookup(url)
+            if cached and time.time() - cached.validated_at < self.ttl_seconds:
+                self.fresh_hits += 1
+                return cached.feed, cached.index
+            return self._fetch(url, cached, timeout)
+
+    def _fetch(self, url: str, cached: Optional[CachedFeed], timeout: float) -> Tuple[object, EpisodeIndex]:
+        headers = {}
+        if cached:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            # 禁用SSL验证（部分播客源证书有问题）
+            response = self.session.get(url, verify=False, timeout=timeout, headers=headers, stream=True)
+            try:
+                if response.status_code == 304 and cached:
+                    cached.validated_at = time.time()
+                    self.revalidated += 1
+                    return cached.feed, cached.index
+
+                response.raise_for_status()
+                # 分块读取后一次拼接，避免反复 += 造成的二次方复制
+                chunks = [chunk for chunk in response.iter_content(chunk_size=64 * 1024) if chunk]
+                content = b"".join(chunks)
+            finally:
+                response.close()
+        except requests.RequestException as e:
+            if cached:
+                # 源站暂时不可用时继续使用过期的缓存
+                print(f"⚠️ RSS重新验证失败，使用缓存: {url} - {str(e)[:100]}")
+                return cached.feed, cached.index
+            raise
+
+        feed = feedparser.parse(content)
+        self.fetches += 1
+        self.bytes_downloaded += len(content)
+        # feed有更新时在旧索引上补充新单集
+        index = EpisodeIndex.build(feed.entries, previous=cached.index if cached else None)
+        if feed.entries:
+            self._store(url, CachedFeed(
+                feed,
+                index,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                len(content)
+            ))
+        return feed, index
+
+    def invalidate(self, url: str):
+        with self._lock:
+            self._feeds.pop(url, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            feeds = len(self._feeds)
+            cached_bytes = sum(f.size for f in self._feeds.values())
+        return {
+            "feeds": feeds,
+            "max_feeds": self.max_feeds,
+            "ttl_seconds": self.ttl_seconds,
+            "cached_bytes": cached_bytes,
+            "fresh_hits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "fetches": self.fetches,
+            "bytes_downloaded": self.bytes_downloaded
+        }
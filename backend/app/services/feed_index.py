@@ -0,0 +1,119 @@
+"""
+RSS单集索引
+feed解析或重新下载时建立一次：把每个单集的 link / id / guid 以及其中的数字ID（苹果 ?i= 单集ID）
+映射到单集，按单集ID查找只需一次字典查询，不必逐条做子串匹配
+"""
+import re
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# link / guid 中可能是单集ID的数字串（苹果单集ID通常10位以上）
+EPISODE_ID_PATTERN = re.compile(r"\d{6,}")
+
+
+def entry_identity(entry) -> Optional[str]:
+    """单集在feed中的身份，用于判断两次下载之间哪些单集是新增的"""
+    return entry.get("id") or entry.get("link") or entry.get("title")
+
+
+def entry_keys(entry) -> List[str]:
+    """单集可被查找的键：完整的 link / id / guid，以及其中的数字ID"""
+    keys = []
+    for value in (entry.get("link"), entry.get("id"), entry.get("guid")):
+        if not value:
+            continue
+        value = str(value)
+        keys.append(value)
+        keys.extend(EPISODE_ID_PATTERN.findall(value))
+    return keys
+
+
+class EpisodeIndex:
+    __slots__ = ("_entries", "_order")
+
+    def __init__(self):
+        self._entries = {}
+        # feed中的单集，从新到旧：[(身份, entry), ...]，用于判断新下载的feed能否增量更新
+        self._order: Deque[Tuple[Optional[str], object]] = deque()
+
+    @property
+    def size(self) -> int:
+        return len(self._order)
+
+    def _prepend(self, entries: List):
+        # 从旧到新写入：同一个键对应多个单集时，保留feed中靠前（较新）的那一个，与原先顺序扫描的结果一致
+        for entry in reversed(entries):
+            for key in entry_keys(entry):
+                self._entries[key] = entry
+            self._order.appendleft((entry_identity(entry), entry))
+
+    def _drop_oldest(self, count: int):
+        for _ in range(count):
+            _, entry = self._order.pop()
+            for key in entry_keys(entry):
+                # 同一个键可能已被更新的单集占用，只删除仍指向被移除单集的键
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+
+    def _try_update(self, entries: List) -> bool:
+        """
+        在本索引上增量更新：feed最前面新增了若干单集，末尾可能移除了若干最旧的单集
+        （限制条数的feed每发布一集就挤掉最旧的一集）。代价只与新增和移除的单集数有关
+
+        Returns:
+            feed的变化不是这种形式（例如中间的单集被删除或重排）时返回False，索引不变
+        """
+        if not self._order or not entries:
+            return False
+        head = self._order[0][0]
+        if head is None:
+            return False
+
+        new_count = 0
+        for entry in entries:
+            if entry_identity(entry) == head:
+                break
+            new_count += 1
+        else:
+            return False
+
+        # 新feed中保留的旧单集应是旧索引的前kept个，核对首尾两端
+        kept = len(entries) - new_count
+        if kept > len(self._order) or entry_identity(entries[-1]) != self._order[kept - 1][0]:
+            return False
+
+        self._drop_oldest(len(self._order) - kept)
+        self._prepend(entries[:new_count])
+        return True
+
+    @classmethod
+    def build(cls, entries: List, previous: "EpisodeIndex" = None) -> "EpisodeIndex":
+        """
+        为feed的单集建立索引
+
+        feed通常只是在最前面追加了新单集（可能同时从末尾挤掉最旧的单集）：
+        这时在旧索引上补上新单集、移除掉出feed的单集即可，代价只与变化的单集数有关；
+        中间的单集被删除或重排时整体重建
+
+        Args:
+            entries: feed.entries
+            previous: 同一feed上一次的索引（会被原地更新）
+
+        Returns:
+            索引
+        """
+        if previous is not None and previous._try_update(entries):
+            return previous
+
+        index = cls()
+        index._prepend(list(entries))
+        return index
+
+    def find(self, episode_id: str):
+        """按单集ID（或完整的link / guid）查找单集，没找到返回None"""
+        if not episode_id:
+            return None
+        return self._entries.get(str(episode_id).strip())
+
+    def __len__(self) -> int:
+        return self.size
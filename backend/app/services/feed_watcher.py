@@ -0,0 +1,206 @@
+"""
+feed订阅与预处理
+后台定期检查订阅的feed，发现新发布的单集后提前完成下载、转码和转写，
+学习者粘贴链接时直接命中转写缓存，不用等待处理
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from app.config import settings
+from app.services.feed_index import entry_identity
+from app.services.ingest_jobs import IngestJob, IngestQueueFullError
+from app.services.transcript_cache import episode_identity
+
+# 没有到检查时间时，多久看一次是否可以提交排队中的单集（秒）
+DISPATCH_INTERVAL = 15
+BUDGET_WINDOW = 24 * 3600
+
+
+class PendingEpisode:
+    __slots__ = ("feed_url", "entry_key", "title", "found_at")
+
+    def __init__(self, feed_url: str, entry_key: str, title: str):
+        self.feed_url = feed_url
+        self.entry_key = entry_key
+        self.title = title
+        self.found_at = time.time()
+
+
+class FeedWatcher:
+    def __init__(
+        self,
+        podcast_service,
+        ingest_jobs,
+        feed_urls: List[str] = None,
+        interval_seconds: int = None,
+        latest_episodes: int = None,
+        max_concurrent: int = None,
+        daily_budget: int = None
+    ):
+        """
+        Args:
+            podcast_service: PodcastService实例（使用其feed缓存和转写缓存）
+            ingest_jobs: IngestJobManager实例，预处理与用户请求共用同一个任务池
+            feed_urls: 订阅的feed（RSS或苹果播客链接）
+            interval_seconds: 检查新单集的间隔
+            latest_episodes: 首次检查时预处理每个feed最新的几集
+            max_concurrent: 同时预处理的单集数
+            daily_budget: 24小时内最多预处理的单集数
+        """
+        self.podcast_service = podcast_service
+        self.ingest_jobs = ingest_jobs
+        self.feed_urls = list(feed_urls if feed_urls is not None else settings.feed_watch_urls)
+        self.interval_seconds = interval_seconds or settings.feed_watch_interval_seconds
+        self.latest_episodes = latest_episodes if latest_episodes is not None else settings.feed_watch_latest_episodes
+        self.max_concurrent = max_concurrent or settings.feed_watch_max_concurrent
+        self.daily_budget = daily_budget if daily_budget is not None else settings.feed_watch_daily_budget
+
+        # feed链接 -> 已见过的单集身份；首次检查前不存在
+        self._seen: Dict[str, Set[str]] = {}
+        # feed链接 -> 上次检查得到的feed对象（304时是同一个对象，可以直接跳过）
+        self._last_feed: Dict[str, object] = {}
+        self._pending: Deque[PendingEpisode] = deque()
+        self._running: List[IngestJob] = []
+        self._submitted_at: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_poll = 0.0
+
+        self.polls = 0
+        self.discovered = 0
+        self.submitted = 0
+        self.skipped_cached = 0
+        self.failed = 0
+
+    def start(self):
+        """启动后台线程；没有订阅的feed时不启动"""
+        if not self.feed_urls or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="feed-watcher", daemon=True)
+        self._thread.start()
+        print(f"📡 已订阅 {len(self.feed_urls)} 个feed，每 {self.interval_seconds}s 检查一次新单集")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if time.time() >= self._next_poll:
+                self._next_poll = time.time() + self.interval_seconds
+                self.poll()
+            self.dispatch()
+            self._stop.wait(min(DISPATCH_INTERVAL, self.interval_seconds))
+
+    def _rss_url(self, feed_url: str) -> str:
+        if 'podcasts.apple.com' in feed_url and '?mt=2' not in feed_url and '/id' in feed_url:
+            return self.podcast_service._convert_apple_podcast_url(feed_url)
+        return feed_url
+
+    def poll(self):
+        """检查所有订阅的feed，把新单集加入预处理队列"""
+        self.polls += 1
+        for feed_url in self.feed_urls:
+            rss_url = self._rss_url(feed_url)
+            try:
+                # TTL过期后条件请求，feed未变化时服务器返回304
+                feed, _ = self.podcast_service.feed_cache.get_indexed(rss_url, timeout=60)
+            except Exception as e:
+                print(f"⚠️ 订阅feed检查失败: {rss_url} - {str(e)[:100]}")
+                continue
+            if feed is self._last_feed.get(rss_url):
+                continue
+            self._last_feed[rss_url] = feed
+            self._collect(rss_url, feed.entries)
+
+    def _collect(self, rss_url: str, entries: List):
+        seen = self._seen.get(rss_url)
+        first_poll = seen is None
+        if first_poll:
+            seen = self._seen[rss_url] = set()
+
+        # feed按发布时间从新到旧排列，遇到已见过的单集即可停止
+        new_entries = []
+        for entry in entries:
+            identity = entry_identity(entry)
+            if not identity:
+                continue
+            if identity in seen:
+                break
+            new_entries.append(entry)
+        seen.update(entry_identity(entry) for entry in new_entries)
+
+        if first_poll:
+            # 首次检查只预处理最新的几集，其余视为历史单集
+            new_entries = new_entries[:self.latest_episodes]
+
+        for entry in new_entries:
+            entry_key = entry.get("id") or entry.get("link")
+            if not entry_key:
+                continue
+            if self._is_cached(entry):
+                self.skipped_cached += 1
+                continue
+            self.discovered += 1
+            print(f"🆕 发现新单集: {entry.get('title', entry_key)}")
+            with self._lock:
+                self._pending.append(PendingEpisode(rss_url, entry_key, entry.get("title", "")))
+
+    def _is_cached(self, entry) -> bool:
+        audio_url = entry.enclosures[0].href if entry.get("enclosures") else None
+        return self.podcast_service.transcript_cache.contains([
+            episode_identity("enclosure", audio_url),
+            episode_identity("entry", entry.get("id"))
+        ])
+
+    def _budget_left(self, now: float) -> int:
+        while self._submitted_at and now - self._submitted_at[0] > BUDGET_WINDOW:
+            self._submitted_at.popleft()
+        return self.daily_budget - len(self._submitted_at)
+
+    def dispatch(self):
+        """在并发和预算限制内，把排队中的单集提交到任务池"""
+        with self._lock:
+            for job in [job for job in self._running if job.finished]:
+                self._running.remove(job)
+                if job.status == "failed":
+                    self.failed += 1
+                    print(f"⚠️ 预处理失败: {job.error}")
+
+            now = time.time()
+            while self._pending and len(self._running) < self.max_concurrent and self._budget_left(now) > 0:
+                episode = self._pending[0]
+                try:
+                    job = self.ingest_jobs.submit(episode.feed_url, entry_key=episode.entry_key)
+                except IngestQueueFullError:
+                    # 用户请求优先，下次再试
+                    break
+                self._pending.popleft()
+                self._running.append(job)
+                self._submitted_at.append(now)
+                self.submitted += 1
+                print(f"⏳ 预处理单集: {episode.title or episode.entry_key}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "feeds": len(self.feed_urls),
+                "interval_seconds": self.interval_seconds,
+                "active": self._thread is not None and self._thread.is_alive(),
+                "polls": self.polls,
+                "discovered": self.discovered,
+                "pending": len(self._pending),
+                "in_progress": len(self._running),
+                "submitted": self.submitted,
+                "failed": self.failed,
+                "skipped_cached": self.skipped_cached,
+                "max_concurrent": self.max_concurrent,
+                "daily_budget": self.daily_budget,
+                "budget_left": self._budget_left(time.time())
+            }
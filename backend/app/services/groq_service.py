@@ -2,14 +2,44 @@
 Groq API 服务
 用于AI对话生成
 """
-from groq import Groq
+from groq import AsyncGroq, Groq
 from app.config import settings
-from typing import List, Dict
+from app.services.audio_utils import extract_chunk, plan_chunks, probe_duration, stitch_segments
+from app.services.text_utils import trim_to_relevant
+from app.services.transcript import Transcript
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, List, Dict, Optional
+import hashlib
+import json
+import threading
 
 class GroqService:
     def __init__(self):
-        self.client = Groq(api_key=settings.groq_api_key)
+        self.client = Groq(api_key=settings.groq_api_key, base_url=settings.groq_base_url)
+        # 异步客户端：在async路由/WebSocket中使用，不阻塞事件循环
+        self.async_client = AsyncGroq(api_key=settings.groq_api_key, base_url=settings.groq_base_url)
         self.model = "llama-3.3-70b-versatile"
+        # 摘要等后台任务用的小模型（更快更便宜）
+        self.summary_model = "llama-3.1-8b-instant"
+        # 角色扮演提示词缓存（同一片段的多个会话共用），按LRU淘汰
+        self._prompt_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._prompt_lock = threading.Lock()
+    
+    @staticmethod
+    def _build_messages(
+        user_message: str,
+        system_prompt: str,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        # 添加对话历史
+        if conversation_history:
+            messages.extend(conversation_history)
+        
+        # 添加当前用户消息
+        messages.append({"role": "user", "content": user_message})
+        return messages
     
     def generate_response(
         self,
@@ -28,14 +58,7 @@ class GroqService:
         Returns:
             AI回复文本
         """
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # 添加对话历史
-        if conversation_history:
-            messages.extend(conversation_history)
-        
-        # 添加当前用户消息
-        messages.append({"role": "user", "content": user_message})
+        messages = self._build_messages(user_message, system_prompt, conversation_history)
         
         try:
             response = self.client.chat.completions.create(
@@ -48,19 +71,169 @@ class GroqService:
         except Exception as e:
             raise Exception(f"Groq API错误: {str(e)}")
 
+    async def agenerate_response(
+        self,
+        user_message: str,
+        system_prompt: str,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        生成AI回复（异步版本，参数与 generate_response 相同）
+        """
+        messages = self._build_messages(user_message, system_prompt, conversation_history)
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"Groq API错误: {str(e)}")
+
+    async def astream_response(
+        self,
+        user_message: str,
+        system_prompt: str,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成AI回复，逐段产出增量文本（参数与 generate_response 相同）
+        
+        Yields:
+            回复文本的增量片段
+        """
+        messages = self._build_messages(user_message, system_prompt, conversation_history)
+        
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            raise Exception(f"Groq API错误: {str(e)}")
+
+    async def asummarize_conversation(
+        self,
+        previous_summary: str,
+        messages: List[Dict[str, str]]
+    ) -> str:
+        """
+        把较早的对话折叠进滚动摘要
+        
+        Args:
+            previous_summary: 之前的摘要（可为空）
+            messages: 需要折叠的对话消息
+        
+        Returns:
+            新的摘要
+        """
+        dialogue = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+        prompt = f"""Update the running summary of a role-play conversation between an English learner (USER) and a podcast host (ASSISTANT).
+
+Previous summary:
+{previous_summary or "(none)"}
+
+New messages:
+{dialogue}
+
+Write the updated summary in at most 120 words. Keep: topics discussed, facts the learner shared about themselves, target words/phrases already practised, and recurring mistakes. Output the summary only."""
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.summary_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                max_tokens=250
+            )
+            return response.choices[0].message.content.strip()
         except Exception as e:
             raise Exception(f"Groq API错误: {str(e)}")
 
-    def transcribe_audio(self, audio_path: str) -> List[Dict]:
+    # 播客Takeaways提取（反馈页的"🎧"部分）
+    TAKEAWAY_SYSTEM_PROMPT = "You are a linguistic filter. Extract only conversational substance. Output valid JSON."
+
+    @staticmethod
+    def _takeaway_prompt(text: str) -> str:
+        # We increase the context window to skip potential intros
+        return f"""Task: Extract 3 distinct, high-value, NATIVE English sentences from the text below.
+        
+        CRITICAL FILTERS (Do NOT extract these):
+        - NO Ads, App promotions, or "Subscribe" messages.
+        - NO Host introductions ("I'm Lindsay", "This is All Ears English").
+        - NO Generic show mottos ("Connection not perfection").
+        
+        TARGET CONTENT:
+        - Phrasal verbs in context.
+        - Idiomatic expressions used in the discussion.
+        - Opinions or specific topic details.
+        
+        Text (Scan for the actual conversation):
+        {text} 
+        
+        Output JSON: {{ "podcast_takeaways": ["Sentence 1", "Sentence 2", "Sentence 3"] }}"""
+
+    @staticmethod
+    def _parse_takeaways(response: str) -> List[str]:
+        try:
+            data = json.loads(response.replace("```json", "").replace("```", "").strip())
+            return [t for t in data.get("podcast_takeaways", []) if isinstance(t, str) and t.strip()]
+        except (ValueError, AttributeError):
+            return []
+
+    def extract_takeaways(self, text: str) -> List[str]:
+        """
+        从播客文本中提取值得复述的句子
+
+        Returns:
+            句子列表（模型输出无法解析时为空）
+
+        Raises:
+            Exception: API调用失败
+        """
+        response = self.generate_response(
+            user_message=self._takeaway_prompt(text),
+            system_prompt=self.TAKEAWAY_SYSTEM_PROMPT,
+            conversation_history=[]
+        )
+        return self._parse_takeaways(response)
+
+    async def aextract_takeaways(self, text: str) -> List[str]:
+        """提取播客Takeaways（异步版本，参数与 extract_takeaways 相同）"""
+        response = await self.agenerate_response(
+            user_message=self._takeaway_prompt(text),
+            system_prompt=self.TAKEAWAY_SYSTEM_PROMPT,
+            conversation_history=[]
+        )
+        return self._parse_takeaways(response)
+
+    def transcribe_audio(
+        self,
+        audio_path: str,
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> Transcript:
         """
         使用Groq Whisper模型转写音频 (极速)
-        会自动处理大文件：如果超过24MB，则进行压缩
+        长音频（超过 transcribe_chunk_seconds）切成有重叠的窗口并发转写后拼接；
+        否则整段上传，如果超过24MB则先压缩
         
         Args:
             audio_path: 音频文件路径
+            progress: 进度回调 progress(stage, fraction)，汇报 transcode / transcribe 阶段
             
         Returns:
-            句子列表 [{"text": "...", "start": 0.0, "end": 1.0}, ...]
+            转写结果（Transcript，按句子下标访问得到 {"text", "start", "end"}）
         """
         import os
         from pydub import AudioSegment
@@ -70,12 +243,24 @@ class GroqService:
         file_to_upload = audio_path
         is_temp_file = False
         
+        # 长音频走分段并行转写
+        if settings.transcribe_chunk_seconds > 0:
+            try:
+                duration = probe_duration(audio_path)
+            except Exception as e:
+                print(f"⚠️ 无法获取音频时长，使用整段转写: {e}")
+                duration = 0
+            if duration > settings.transcribe_chunk_seconds:
+                return self._transcribe_chunked(audio_path, duration, progress=progress)
+        
         try:
             file_size = os.path.getsize(audio_path)
             
             # 如果文件过大，进行压缩
             if file_size > MAX_SIZE_BYTES:
                 print(f"音频文件过大 ({file_size / 1024 / 1024:.2f} MB)，正在压缩...")
+                if progress:
+                    progress("transcode", 0.0)
                 
                 # 创建临时文件路径
                 import tempfile
@@ -119,24 +304,20 @@ class GroqService:
                     print(f"压缩完成，新大小: {new_size / 1024 / 1024:.2f} MB")
             
             # 开始转写
-            with open(file_to_upload, "rb") as file:
-                transcription = self.client.audio.transcriptions.create(
-                    file=(file_to_upload, file.read()),
-                    model="whisper-large-v3",
-                    response_format="verbose_json",
-                    temperature=0.0
-                )
+            if progress:
+                progress("transcribe", 0.0)
+            segments = self._transcribe_file(file_to_upload)
             
             # 转换格式
             sentences = []
-            for segment in transcription.segments:
+            for segment in segments:
                 sentences.append({
-                    "text": segment["text"].strip(),
+                    "text": segment["text"],
                     "start": round(segment["start"], 2),
                     "end": round(segment["end"], 2)
                 })
             
-            return sentences
+            return Transcript.from_segments(sentences)
             
         except Exception as e:
             raise Exception(f"Groq转写错误: {str(e)}")
@@ -148,27 +329,151 @@ class GroqService:
                 except:
                     pass
     
+    def _transcribe_file(self, file_path: str) -> List[Dict]:
+        """
+        上传单个音频文件到Groq转写
+        
+        Returns:
+            未取整的句子列表 [{"text": "...", "start": 0.0, "end": 1.0}, ...]
+        """
+        import os
+        
+        # 直接传文件对象，由HTTP客户端分块读取上传，不把整个文件读进内存
+        with open(file_path, "rb") as file:
+            transcription = self.client.audio.transcriptions.create(
+                file=(os.path.basename(file_path), file),
+                model="whisper-large-v3",
+                response_format="verbose_json",
+                temperature=0.0
+            )
+        return [
+            {
+                "text": segment["text"].strip(),
+                "start": segment["start"],
+                "end": segment["end"]
+            }
+            for segment in transcription.segments
+        ]
+    
+    def _transcribe_chunked(
+        self,
+        audio_path: str,
+        duration: float,
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> Transcript:
+        """
+        分段并行转写长音频
+        
+        按 transcribe_chunk_seconds 切成有重叠的窗口，每个窗口单独切片、上传，
+        最多 transcribe_parallelism 个窗口同时进行，最后校正时间戳并去掉重叠区的重复句子
+        
+        Args:
+            audio_path: 音频文件路径
+            duration: 音频时长（秒）
+            progress: 进度回调
+        
+        Returns:
+            转写结果（Transcript）
+        """
+        import os
+        import shutil
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        chunks = plan_chunks(
+            duration,
+            settings.transcribe_chunk_seconds,
+            settings.transcribe_chunk_overlap_seconds
+        )
+        parallelism = max(1, settings.transcribe_parallelism)
+        print(f"长音频分段转写: {duration / 60:.1f} 分钟 -> {len(chunks)} 段，并发 {parallelism}")
+        
+        temp_dir = tempfile.mkdtemp(prefix="talk2me_chunks_")
+        
+        def transcribe_chunk(index: int, start: float, length: float) -> List[Dict]:
+            chunk_path = os.path.join(temp_dir, f"chunk_{index:04d}.mp3")
+            extract_chunk(audio_path, start, length, chunk_path)
+            try:
+                return self._transcribe_file(chunk_path)
+            finally:
+                os.remove(chunk_path)
+        
+        if progress:
+            progress("transcribe", 0.0)
+        
+        results: List[List[Dict]] = [None] * len(chunks)
+        try:
+            with ThreadPoolExecutor(max_workers=parallelism) as executor:
+                futures = {
+                    executor.submit(transcribe_chunk, index, start, length): index
+                    for index, (start, length) in enumerate(chunks)
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    results[futures[future]] = future.result()
+                    if progress:
+                        progress("transcribe", done / len(chunks))
+        except Exception as e:
+            raise Exception(f"Groq转写错误: {str(e)}")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        
+        return Transcript.from_segments(stitch_segments([
+            (start, length, results[index])
+            for index, (start, length) in enumerate(chunks)
+        ]))
+    
     def generate_role_play_prompt(
         self,
         podcast_context: str,
-        user_role: str = "learner"
+        user_role: str = "learner",
+        language_points: Optional[List[str]] = None
     ) -> str:
         """
         生成Role Play的系统提示词
         
+        过长的片段只保留与目标语言点最相关的句子（上限 role_play_segment_max_chars），
+        结果按片段内容缓存，同一片段重复开始对话时不再重新构建
+        
         Args:
             podcast_context: 播客片段内容
             user_role: 用户角色（learner表示学习者，不是播客主播）
+            language_points: 目标语言点（单词/短语），为空时从片段中自动提取关键词
         
         Returns:
             系统提示词
         """
+        key_source = "\0".join([user_role, podcast_context, *(language_points or [])])
+        key = hashlib.sha1(key_source.encode("utf-8")).hexdigest()
+        with self._prompt_lock:
+            prompt = self._prompt_cache.get(key)
+            if prompt is not None:
+                self._prompt_cache.move_to_end(key)
+                return prompt
+
+        context = trim_to_relevant(
+            podcast_context,
+            settings.role_play_segment_max_chars,
+            language_points
+        )
+        prompt = self._render_role_play_prompt(context, language_points)
+
+        with self._prompt_lock:
+            self._prompt_cache[key] = prompt
+            while len(self._prompt_cache) > settings.role_play_prompt_cache_size:
+                self._prompt_cache.popitem(last=False)
+        return prompt
+    
+    @staticmethod
+    def _render_role_play_prompt(podcast_context: str, language_points: Optional[List[str]]) -> str:
+        focus = ""
+        if language_points:
+            focus = "\nTarget language points: " + ", ".join(language_points) + "\n"
         return f"""You are Host A from All Ears English podcast. 
 You're having a friendly conversation with a language learner who has been practicing with your podcast.
 
 Context from podcast:
 {podcast_context}
-
+{focus}
 Your Goal:
 Engage in a natural, "Free Talk" conversation derived from this context. 
 CRITICAL: While chatting naturally, your hidden agenda is to help them practice the LANGUAGE POINTS (vocabulary/grammar) from the context above (e.g., if the context is about 'near vs nearby', try to use these words and create situations for the user to use them).
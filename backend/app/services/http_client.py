@@ -0,0 +1,33 @@
+"""
+共享HTTP客户端
+播客处理中的RSS、iTunes API、网页提取和音频下载共用一个带连接池的Session，
+同一主机的后续请求复用已建立的TCP/TLS连接（keep-alive），不必每次重新握手
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+
+
+def create_session(pool_connections: int = None, pool_maxsize: int = None) -> requests.Session:
+    """
+    创建带连接池的Session
+
+    Args:
+        pool_connections: 缓存连接池的主机数
+        pool_maxsize: 每个主机保持的最大连接数（应不小于同时访问同一主机的线程数）
+
+    Returns:
+        可在多个线程间共享的Session
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections or settings.http_pool_connections,
+        pool_maxsize=pool_maxsize or settings.http_pool_maxsize
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,209 @@
+"""
+播客处理任务队列
+把耗时的播客处理（解析RSS、下载、转码、转写）放到有界的线程池中执行，
+API只负责提交任务和查询进度，不再阻塞事件循环
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+
+# 各阶段在整体进度中所占的区间 [起点, 终点)
+STAGE_RANGES = {
+    "queued": (0.0, 0.0),
+    "resolve_feed": (0.0, 0.1),
+    "download": (0.1, 0.4),
+    "transcode": (0.4, 0.5),
+    "transcribe": (0.5, 1.0),
+    "done": (1.0, 1.0),
+}
+
+# 已结束的任务保留多久（秒）供客户端查询结果
+FINISHED_JOB_TTL = 3600
+
+
+class IngestQueueFullError(Exception):
+    """排队任务过多，拒绝新的提交"""
+
+
+class IngestJob:
+    def __init__(self, url: str, entry_key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.entry_key = entry_key
+        self.status = "queued"  # queued / running / succeeded / failed
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # 每次状态变化加1，SSE据此判断是否需要推送
+        self.version = 0
+        self.future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+
+class IngestJobManager:
+    def __init__(
+        self,
+        podcast_service,
+        takeaway_index=None,
+        database=None,
+        on_episode_saved: Optional[Callable[[str], None]] = None,
+        max_workers: int = None,
+        max_pending: int = None
+    ):
+        """
+        Args:
+            podcast_service: PodcastService实例
+            takeaway_index: TakeawayIndex实例，转写完成后在后台为单集构建Takeaways索引（可选）
+            database: Database实例，转写结果写入数据库（可选）
+            on_episode_saved: 单集写入（或覆盖）数据库后的回调，参数为episode_id
+            max_workers: 同时处理的播客数量上限（每个节点）
+            max_pending: 排队+处理中的任务数量上限，超过时拒绝提交
+        """
+        self.podcast_service = podcast_service
+        self.takeaway_index = takeaway_index
+        self.database = database
+        self.on_episode_saved = on_episode_saved
+        self.max_workers = max_workers or settings.ingest_max_workers
+        self.max_pending = max_pending or settings.ingest_max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="ingest"
+        )
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+        # 提交时合并到已有任务的次数
+        self.attached = 0
+
+    def _active_jobs(self) -> List[IngestJob]:
+        return [job for job in self._jobs.values() if not job.finished]
+
+    def _prune(self):
+        """清理过期的已结束任务"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.updated_at > FINISHED_JOB_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, url: str, entry_key: Optional[str] = None) -> IngestJob:
+        """
+        提交播客处理任务
+
+        同一链接（同一单集）已有任务在排队或处理中时，直接返回该任务，不重复处理
+
+        Args:
+            url: 播客链接
+            entry_key: 指定处理feed中的哪一集（entry的id或link），为None时按链接决定
+
+        Raises:
+            IngestQueueFullError: 排队任务已达上限
+        """
+        with self._lock:
+            self._prune()
+            active = self._active_jobs()
+            for job in active:
+                if job.url == url and job.entry_key == entry_key:
+                    self.attached += 1
+                    return job
+            if len(active) >= self.max_pending:
+                raise IngestQueueFullError("当前处理中的播客过多，请稍后再试")
+            job = IngestJob(url, entry_key)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job)
+            return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _update(self, job: IngestJob, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            job.version += 1
+
+    def _report(self, job: IngestJob, stage: str, fraction: float = 0.0):
+        with self._lock:
+            start, end = STAGE_RANGES.get(stage, (job.progress, job.progress))
+            overall = start + (end - start) * max(0.0, min(fraction, 1.0))
+            # 进度只增不减
+            job.stage = stage
+            job.progress = max(job.progress, overall)
+            job.updated_at = time.time()
+            job.version += 1
+
+    def _run(self, job: IngestJob) -> Dict:
+        self._update(job, status="running")
+        try:
+            result = self.podcast_service.process_podcast_url(
+                job.url,
+                progress=lambda stage, fraction: self._report(job, stage, fraction),
+                entry_key=job.entry_key
+            )
+        except Exception as e:
+            self._update(job, status="failed", error=str(e))
+            raise
+
+        if self.database is not None:
+            try:
+                self._persist(job, result)
+            except Exception as e:
+                print(f"⚠️ 单集保存失败: {e}")
+
+        self._update(job, status="succeeded", stage="done", progress=1.0, result=result)
+
+        # Takeaways索引在后台构建，不计入任务进度（缓存命中时索引通常已存在，直接跳过）
+        if self.takeaway_index is not None:
+            try:
+                self.takeaway_index.schedule(result.get("episode_id"), result["sentences"])
+            except Exception as e:
+                print(f"⚠️ Takeaways索引提交失败: {e}")
+        return result
+
+    def _persist(self, job: IngestJob, result: Dict):
+        """写入数据库；缓存命中返回的同一份转写已经保存过时跳过"""
+        stored = self.database.get_episode(result["episode_id"], with_sentences=False)
+        if (stored and stored["sentence_count"] == len(result["sentences"])
+                and stored["audio_path"] == result.get("audio_path")):
+            return
+        self.database.save_episode(result, source_url=job.url)
+        if self.on_episode_saved:
+            self.on_episode_saved(result["episode_id"])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            active = self._active_jobs()
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": sum(1 for job in active if job.status == "running"),
+                "queued": sum(1 for job in active if job.status == "queued"),
+                "tracked": len(self._jobs),
+                "attached": self.attached,
+                "inflight": self.podcast_service.inflight.stats()
+            }
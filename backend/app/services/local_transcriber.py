@@ -0,0 +1,155 @@
+"""
+本地多核转写引擎
+整集音频切成有重叠的窗口，分给进程池中的多个faster-whisper模型副本并行转写，
+吞吐量随CPU核数增长；不依赖网络，也没有API费用
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from app.services.audio_utils import decode_segment, plan_chunks, probe_duration, stitch_segments
+from app.services.transcript import Transcript
+
+# 窗口不宜过短：每个窗口开头都缺少上文，过短会影响识别准确率
+MIN_CHUNK_SECONDS = 60
+
+# 子进程中的模型（每个进程加载一次）
+_worker_model = None
+
+
+def _init_worker(model_size: str, compute_type: str, cpu_threads: int):
+    global _worker_model
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(
+        model_size,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads
+    )
+
+
+def _transcribe_chunk(audio_path: str, start: float, length: float, beam_size: int, language: str) -> List[Dict]:
+    """在子进程中转写一个窗口，返回相对窗口起点的句子"""
+    audio = decode_segment(audio_path, start, length)
+    if not len(audio):
+        return []
+    segments, _ = _worker_model.transcribe(audio, language=language, beam_size=beam_size)
+    return [
+        {"text": segment.text.strip(), "start": segment.start, "end": segment.end}
+        for segment in segments
+    ]
+
+
+class LocalTranscriber:
+    def __init__(
+        self,
+        model_size: str = None,
+        compute_type: str = None,
+        beam_size: int = None,
+        cpu_threads: int = None,
+        workers: int = None,
+        chunk_seconds: int = None
+    ):
+        """
+        Args:
+            model_size: 模型大小 (tiny, base, small, medium, large-v3 ...)
+            compute_type: 计算精度 (int8, int8_float32, float32 ...)
+            beam_size: 解码的beam大小，1为贪心解码（最快）
+            cpu_threads: 每个进程的CPU线程数
+            workers: 进程数（模型副本数），0表示按 核数 / 线程数 自动确定
+            chunk_seconds: 每个窗口的最大长度
+        """
+        self.model_size = model_size or settings.local_whisper_model
+        self.compute_type = compute_type or settings.local_whisper_compute_type
+        self.beam_size = beam_size or settings.local_whisper_beam_size
+        self.cpu_threads = cpu_threads or settings.local_whisper_cpu_threads
+        workers = workers if workers is not None else settings.local_whisper_workers
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.cpu_threads)
+        self.chunk_seconds = chunk_seconds or settings.local_transcribe_chunk_seconds
+        self.overlap_seconds = settings.transcribe_chunk_overlap_seconds
+        # 窗口长度最短为MIN_CHUNK_SECONDS，重叠必须比它短，否则窗口无法前进
+        if not 0 <= self.overlap_seconds < MIN_CHUNK_SECONDS:
+            raise ValueError(
+                f"transcribe_chunk_overlap_seconds ({self.overlap_seconds}) 必须小于 {MIN_CHUNK_SECONDS} 秒"
+            )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # 多个处理任务线程可能同时第一次转写，只能创建一个进程池
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # 延迟创建：进程启动和模型加载较慢，之后所有单集共用
+        with self._executor_lock:
+            if self._executor is not None:
+                return self._executor
+            print(
+                f"启动本地转写进程池: {self.workers} 进程 × {self.cpu_threads} 线程，"
+                f"模型 {self.model_size} ({self.compute_type})，beam {self.beam_size}"
+            )
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # 服务进程里有大量线程，fork出的子进程可能继承被占用的锁，使用spawn
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_size, self.compute_type, self.cpu_threads)
+            )
+            return self._executor
+
+    def close(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def transcribe_audio(
+        self,
+        audio_path: str,
+        progress: Optional[Callable[[str, float], None]] = None,
+        language: str = "en"
+    ) -> Transcript:
+        """
+        本地转写整集音频（与 GroqService.transcribe_audio 的返回格式相同）
+
+        窗口长度取 chunk_seconds 与 时长 / 进程数 中较小的一个，让所有进程都有活干
+
+        Args:
+            audio_path: 音频文件路径
+            progress: 进度回调 progress(stage, fraction)，汇报 transcribe 阶段
+            language: 语言代码
+
+        Returns:
+            转写结果（Transcript）
+        """
+        try:
+            duration = probe_duration(audio_path)
+            chunk_seconds = max(
+                MIN_CHUNK_SECONDS,
+                min(self.chunk_seconds, math.ceil(duration / self.workers) + self.overlap_seconds)
+            )
+            chunks = plan_chunks(duration, chunk_seconds, self.overlap_seconds)
+            print(f"本地分段转写: {duration / 60:.1f} 分钟 -> {len(chunks)} 段，{self.workers} 进程")
+
+            if progress:
+                progress("transcribe", 0.0)
+
+            executor = self._pool()
+            futures = {
+                executor.submit(_transcribe_chunk, audio_path, start, length, self.beam_size, language): index
+                for index, (start, length) in enumerate(chunks)
+            }
+            results: List[List[Dict]] = [None] * len(chunks)
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if progress:
+                    progress("transcribe", done / len(chunks))
+        except Exception as e:
+            raise Exception(f"本地转写错误: {str(e)}")
+
+        return Transcript.from_segments(stitch_segments([
+            (start, length, results[index])
+            for index, (start, length) in enumerate(chunks)
+        ]))
@@ -2,19 +2,51 @@
 播客处理服务
 解析RSS feed，下载音频，处理内容
 """
-import feedparser
 import requests
 import os
-from typing import Dict, List
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
 from app.config import settings
 
+from app.services.feed_cache import FeedCache
+from app.services.feed_index import EpisodeIndex
+from app.services.http_client import create_session
+from app.services.single_flight import SingleFlight
 from app.services.groq_service import GroqService
+from app.services.transcript_cache import TranscriptCache, episode_identity, file_content_hash
 
 class PodcastService:
     def __init__(self):
         self.groq_service = GroqService()
+        self.transcriber = self._create_transcriber()
+        self.transcript_cache = TranscriptCache()
+        # RSS、iTunes API、网页提取、音频下载共用的keep-alive连接池
+        self.http = create_session()
+        self.feed_cache = FeedCache(session=self.http)
+        # 正在处理的单集（按单集身份），同一单集的并发请求共用一次下载和转写
+        self.inflight = SingleFlight()
+        self._feed_pool = ThreadPoolExecutor(
+            max_workers=settings.feed_race_workers,
+            thread_name_prefix="feed"
+        )
         os.makedirs(settings.audio_storage_path, exist_ok=True)
     
+    def close(self):
+        """释放后台资源（本地转写进程池、HTTP连接池），应用关闭时调用"""
+        if hasattr(self.transcriber, "close"):
+            self.transcriber.close()
+        self.http.close()
+    
+    def _create_transcriber(self):
+        """按 transcription_engine 选择单集转写引擎（两者的 transcribe_audio 返回格式相同）"""
+        if settings.transcription_engine == "local":
+            from app.services.local_transcriber import LocalTranscriber
+            return LocalTranscriber()
+        if settings.transcription_engine != "groq":
+            raise ValueError(f"未知的转写引擎: {settings.transcription_engine}")
+        return self.groq_service
+    
     def _convert_apple_podcast_url(self, url: str) -> str:
         """
         将苹果播客网页链接转换为RSS feed链接
@@ -59,31 +91,19 @@ class PodcastService:
         match = re.search(r'[?&]i=(\d+)', url)
         return match.group(1) if match else None
     
-    def _find_episode_in_feed(self, feed, episode_id: str):
+    def _find_episode_in_feed(self, feed_index: EpisodeIndex, episode_id: str):
         """
         在RSS feed中查找指定的单集
         
         Args:
-            feed: feedparser解析的feed对象
+            feed_index: feed的单集索引（随feed缓存，解析时建立一次）
             episode_id: 单集ID（苹果播客的单集ID）
         
         Returns:
             找到的entry，如果没找到返回None
         """
-        if not episode_id:
-            return None
-        
-        # 在feed中查找匹配的单集
-        # 单集ID可能在entry.link、entry.id或entry.guid中
-        for entry in feed.entries:
-            # 检查link中是否包含单集ID
-            if episode_id in entry.get('link', ''):
-                return entry
-            # 检查id或guid中是否包含
-            if episode_id in entry.get('id', '') or episode_id in str(entry.get('guid', '')):
-                return entry
-        
-        return None
+        # 单集ID可能在entry.link、entry.id或entry.guid中，索引中已按其中的数字ID建好映射
+        return feed_index.find(episode_id)
     
     def _download_with_ytdlp(self, url: str, save_path: str) -> str:
         """
@@ -124,12 +144,20 @@ class PodcastService:
         except Exception as e:
             raise Exception(f"yt-dlp下载失败: {str(e)}")
     
-    def process_podcast_url(self, podcast_url: str) -> Dict:
+    def process_podcast_url(
+        self,
+        podcast_url: str,
+        progress: Optional[Callable[[str, float], None]] = None,
+        entry_key: Optional[str] = None
+    ) -> Dict:
         """
         处理播客URL
         
         Args:
             podcast_url: 播客链接（苹果播客网页链接或RSS feed）
+            progress: 进度回调 progress(stage, fraction)，
+                stage为 resolve_feed / download / transcode / transcribe，fraction为该阶段内的进度(0~1)
+            entry_key: 指定处理feed中的哪一集（entry的id或link），为None时按URL中的单集ID或最新一集
         
         Returns:
             包含音频URL和句子列表的字典
@@ -138,14 +166,21 @@ class PodcastService:
         episode_id = self._extract_episode_id(podcast_url)
         original_url = podcast_url
         
+        # 指定了苹果单集ID时，命中缓存可以连RSS都不用请求
+        apple_identity = None
+        if episode_id and 'podcasts.apple.com' in original_url:
+            apple_identity = episode_identity("apple", episode_id)
+            cached = self.transcript_cache.get([apple_identity], record_miss=False)
+            if cached:
+                print(f"✅ 转写缓存命中: {cached['title']}")
+                return cached
+        
         # 如果是苹果播客网页链接，转换为RSS
         if 'podcasts.apple.com' in podcast_url and '/podcast/' in podcast_url:
             if '?mt=2' not in podcast_url and '/id' in podcast_url:
                 podcast_url = self._convert_apple_podcast_url(podcast_url)
         
         # 解析RSS feed - 使用requests避免SSL证书问题
-        import ssl
-        import urllib.request
         import warnings
         
         # 禁用SSL警告
@@ -169,62 +204,24 @@ class PodcastService:
         else:
             rss_sources = [podcast_url]
         
-        feed = None
-        last_error = None
+        if progress:
+            progress("resolve_feed", 0.0)
         
-        for rss_url in rss_sources:
-            try:
-                print(f"尝试RSS源: {rss_url}")
-                # 优先使用requests（禁用SSL验证）
-                response = requests.get(rss_url, verify=False, timeout=60, headers={
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-                }, stream=True)
-                response.raise_for_status()
-                # 读取完整内容
-                content = b''
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        content += chunk
-                feed = feedparser.parse(content)
-                
-                # 检查是否有单集
-                if feed.entries:
-                    print(f"✅ RSS源可用: {rss_url}")
-                    break
-            except Exception as e:
-                last_error = e
-                print(f"⚠️ RSS源失败: {rss_url} - {str(e)[:100]}")
-                continue
+        feed, feed_index, last_error = self._resolve_feed(rss_sources)
         
         # 如果RSS feed解析失败，且原始URL是苹果播客链接，直接使用yt-dlp
         if (not feed or not feed.entries) and 'podcasts.apple.com' in original_url:
             print("⚠️ RSS feed解析失败，尝试使用yt-dlp直接从苹果播客下载...")
-            try:
-                import hashlib
-                # 使用yt-dlp下载
-                audio_path = self._download_with_ytdlp(original_url, settings.audio_storage_path)
-                print(f"✅ yt-dlp下载成功: {audio_path}")
-                
-                # 获取标题（yt-dlp会返回信息）
-                import yt_dlp
-                ydl_opts = {'quiet': True, 'no_warnings': True}
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(original_url, download=False)
-                    title = info.get('title', 'Unknown')
-                
-                # 使用 Groq 转写
-                sentences = self.groq_service.transcribe_audio(audio_path)
-                
-                audio_filename = os.path.basename(audio_path)
-                return {
-                    "title": title,
-                    "audio_url": f"/audio/{audio_filename}",
-                    "audio_path": audio_path,
-                    "sentences": sentences,
-                    "duration": sentences[-1]["end"] if sentences else 0
-                }
-            except Exception as e:
-                raise Exception(f"yt-dlp下载失败: {str(e)}")
+            url_identity = episode_identity("url", original_url)
+            cached = self.transcript_cache.get([apple_identity, url_identity])
+            if cached:
+                print(f"✅ 转写缓存命中: {cached['title']}")
+                return cached
+            return self.inflight.run(
+                [apple_identity, url_identity],
+                lambda report: self._process_with_ytdlp(original_url, apple_identity, url_identity, report),
+                progress
+            )
         
         if not feed or not feed.entries:
             if last_error:
@@ -232,12 +229,19 @@ class PodcastService:
             else:
                 raise Exception("无法解析播客链接，请检查URL是否正确")
         
+        if entry_key:
+            # 后台预处理指定的单集（例如feed中新发布的单集）
+            entry = self._find_episode_in_feed(feed_index, entry_key)
+            if not entry:
+                raise Exception(f"RSS feed中没有该单集: {entry_key}")
         # 如果指定了单集ID，尝试查找对应的单集
-        if episode_id:
-            entry = self._find_episode_in_feed(feed, episode_id)
+        elif episode_id:
+            entry = self._find_episode_in_feed(feed_index, episode_id)
             if entry:
                 print(f"✅ 找到指定单集: {entry.title}")
             else:
+                # 回退到最新一集时，苹果单集ID不能作为这一集的身份
+                apple_identity = None
                 # 如果RSS feed中没有找到单集ID，使用最新一集
                 # （因为RSS feed可能不包含所有历史单集，或者单集ID格式不同）
                 print(f"⚠️ 未在RSS feed中找到单集ID {episode_id}")
@@ -252,12 +256,103 @@ class PodcastService:
         
         # 获取音频URL或直接下载
         audio_url = None
-        audio_path = None
         
         # 方法1: 从enclosures获取（标准RSS）
         if entry.enclosures:
             audio_url = entry.enclosures[0].href
         
+        # 单集身份：enclosure URL / entry.id（下载后再补充音频内容哈希）
+        identities = [
+            episode_identity("enclosure", audio_url),
+            episode_identity("entry", entry.get('id')),
+            apple_identity
+        ]
+        cached = self.transcript_cache.get(identities, record_miss=False)
+        if cached:
+            print(f"✅ 转写缓存命中: {cached['title']}")
+            return cached
+        
+        # 同一单集（不论来自哪个链接）同时只处理一次，并发的请求等待并共用这一次的结果，
+        # 也避免多个请求同时写同一个音频文件
+        return self.inflight.run(
+            identities,
+            lambda report: self._process_entry(entry, audio_url, identities, original_url, episode_id, report),
+            progress
+        )
+    
+    def _process_with_ytdlp(
+        self,
+        original_url: str,
+        apple_identity: Optional[str],
+        url_identity: str,
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> Dict:
+        """RSS不可用时用yt-dlp直接从苹果播客下载并转写"""
+        try:
+            # 使用yt-dlp下载
+            if progress:
+                progress("download", 0.0)
+            audio_path = self._download_with_ytdlp(original_url, settings.audio_storage_path)
+            print(f"✅ yt-dlp下载成功: {audio_path}")
+            
+            # 获取标题（yt-dlp会返回信息）
+            import yt_dlp
+            ydl_opts = {'quiet': True, 'no_warnings': True}
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(original_url, download=False)
+                title = info.get('title', 'Unknown')
+            
+            # 使用 Groq 或本地引擎转写
+            sentences = self.transcriber.transcribe_audio(audio_path, progress=progress)
+            
+            audio_filename = os.path.basename(audio_path)
+            result = {
+                "title": title,
+                "audio_url": f"/audio/{audio_filename}",
+                "audio_path": audio_path,
+                "sentences": sentences,
+                "duration": sentences.duration
+            }
+            self.transcript_cache.put(
+                [apple_identity or url_identity, url_identity,
+                 episode_identity("content", file_content_hash(audio_path))],
+                result
+            )
+            return result
+        except Exception as e:
+            raise Exception(f"yt-dlp下载失败: {str(e)}")
+    
+    def _process_entry(
+        self,
+        entry,
+        audio_url: Optional[str],
+        identities: List[Optional[str]],
+        original_url: str,
+        episode_id: Optional[str],
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> Dict:
+        """
+        下载、转码并转写feed中的一集（调用前已确认转写缓存未命中）
+        
+        Args:
+            entry: feed中的单集
+            audio_url: enclosure中的音频URL，没有时为None
+            identities: 单集身份，下载后补充音频内容哈希
+            original_url: 用户提交的链接
+            episode_id: 苹果单集ID
+            progress: 进度回调
+        
+        Returns:
+            与 process_podcast_url 相同结构的结果字典
+        """
+        # 可能刚好有同一单集的处理在本次请求查缓存之后完成
+        cached = self.transcript_cache.get(identities, record_miss=False)
+        if cached:
+            print(f"✅ 转写缓存命中: {cached['title']}")
+            return cached
+        
+        audio_path = None
+        
         # 方法2: 如果原始URL是苹果播客链接且没有enclosures，使用yt-dlp直接下载
         if not audio_url and 'podcasts.apple.com' in original_url:
             print("⚠️ RSS feed中没有音频文件链接，使用yt-dlp直接从苹果播客下载...")
@@ -269,6 +364,8 @@ class PodcastService:
                 audio_filename = audio_filename.replace(" ", "_")
                 
                 # 使用yt-dlp下载
+                if progress:
+                    progress("download", 0.0)
                 audio_path = self._download_with_ytdlp(original_url, settings.audio_storage_path)
                 print(f"✅ yt-dlp下载成功: {audio_path}")
             except Exception as e:
@@ -302,6 +399,7 @@ class PodcastService:
             raise Exception("未找到音频文件。RSS feed中可能不包含音频链接，请尝试使用其他播客源或直接提供音频文件URL。")
         
         # 如果使用URL下载，需要下载音频
+        download_stats = None
         if audio_url and not audio_path:
             import hashlib
             safe_title = "".join(c for c in entry.title if c.isalnum() or c in (' ', '-', '_')).strip()[:50]
@@ -310,21 +408,100 @@ class PodcastService:
             audio_filename = audio_filename.replace(" ", "_")
             audio_path = os.path.join(settings.audio_storage_path, audio_filename)
             
-            self._download_audio(audio_url, audio_path)
+            transcode_path = None
+            if settings.stream_transcode:
+                transcode_path = f"{os.path.splitext(audio_path)[0]}.{uuid.uuid4().hex[:8]}.asr.mp3"
+            download_stats = self._download_audio(
+                audio_url, audio_path, progress=progress, transcode_path=transcode_path
+            )
         
-        # 使用 Groq 转写
-        sentences = self.groq_service.transcribe_audio(audio_path)
+        # 转写用的16kHz版本（流式转码失败时用原文件）
+        transcribe_path = (download_stats or {}).get("transcode_path") or audio_path
+        
+        try:
+            # 不同的URL可能指向同一个音频文件（例如带跟踪参数的重定向链接）
+            # 流式下载时已经顺便算好了内容哈希，不用再读一遍文件
+            content_hash = download_stats["sha1"] if download_stats else file_content_hash(audio_path)
+            identities.append(episode_identity("content", content_hash))
+            cached = self.transcript_cache.get(identities[-1:])
+            if cached:
+                print(f"✅ 转写缓存命中（音频内容相同）: {cached['title']}")
+                if os.path.abspath(cached["audio_path"]) != os.path.abspath(audio_path):
+                    os.remove(audio_path)
+                # 只把这次请求的身份登记为别名，转写内容已在缓存里
+                self.transcript_cache.alias(identities[:-1], identities[-1])
+                return cached
+            
+            # 使用 Groq 或本地引擎转写
+            sentences = self.transcriber.transcribe_audio(transcribe_path, progress=progress)
+        finally:
+            if transcribe_path != audio_path and os.path.exists(transcribe_path):
+                os.remove(transcribe_path)
         
         # 获取音频文件名（用于URL）
         audio_filename = os.path.basename(audio_path)
         
-        return {
+        result = {
             "title": entry.title,
             "audio_url": f"/audio/{audio_filename}",
             "audio_path": audio_path,
             "sentences": sentences,
-            "duration": sentences[-1]["end"] if sentences else 0
+            "duration": sentences.duration
         }
+        self.transcript_cache.put(identities, result)
+        return result
+    
+    def _fetch_feed(self, rss_url: str):
+        print(f"尝试RSS源: {rss_url}")
+        # TTL内直接用缓存，过期后条件请求（未变化时304，不重新下载和解析）
+        return self.feed_cache.get_indexed(rss_url, timeout=60)
+    
+    def _resolve_feed(
+        self,
+        rss_sources: List[str]
+    ) -> Tuple[Optional[object], Optional[EpisodeIndex], Optional[Exception]]:
+        """
+        同时请求所有候选RSS源，最先返回有单集的feed胜出
+        
+        其余请求不取消，在后台完成后照常写入feed缓存，下次可直接命中
+        
+        Args:
+            rss_sources: 候选RSS链接
+        
+        Returns:
+            (feed, 单集索引, last_error)，没有可用的源时feed为None或没有单集
+        """
+        if len(rss_sources) == 1:
+            try:
+                feed, feed_index = self._fetch_feed(rss_sources[0])
+            except Exception as e:
+                print(f"⚠️ RSS源失败: {rss_sources[0]} - {str(e)[:100]}")
+                return None, None, e
+            if feed.entries:
+                print(f"✅ RSS源可用: {rss_sources[0]}")
+            return feed, feed_index, None
+        
+        futures = {self._feed_pool.submit(self._fetch_feed, rss_url): rss_url for rss_url in rss_sources}
+        feed, feed_index = None, None
+        last_error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rss_url = futures[future]
+                try:
+                    result, result_index = future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"⚠️ RSS源失败: {rss_url} - {str(e)[:100]}")
+                    continue
+                # 检查是否有单集
+                if result.entries:
+                    print(f"✅ RSS源可用: {rss_url}")
+                    return result, result_index, last_error
+                if feed is None:
+                    feed, feed_index = result, result_index
+        return feed, feed_index, last_error
     
     def _get_audio_from_itunes_api(self, episode_id: str) -> str:
         """
@@ -339,7 +516,7 @@ class PodcastService:
         try:
             # iTunes API查找单集
             api_url = f"https://itunes.apple.com/lookup?id={episode_id}"
-            response = requests.get(api_url, timeout=10)
+            response = self.http.get(api_url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('results') and len(data['results']) > 0:
@@ -362,20 +539,14 @@ class PodcastService:
             音频URL，如果失败返回None
         """
         import re
-        import ssl
-        import urllib.request
         import warnings
         warnings.filterwarnings('ignore')
         
         try:
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            req = urllib.request.Request(webpage_url, headers={
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            })
-            with urllib.request.urlopen(req, context=ssl_context, timeout=30) as response:
-                html = response.read().decode('utf-8', errors='ignore')
+            # 不验证证书（部分播客网站证书有问题）
+            response = self.http.get(webpage_url, verify=False, timeout=30)
+            response.raise_for_status()
+            html = response.content.decode('utf-8', errors='ignore')
             
             # 查找音频URL模式
             patterns = [
@@ -394,13 +565,161 @@ class PodcastService:
             print(f"网页提取错误: {e}")
         return None
     
-    def _download_audio(self, url: str, save_path: str):
-        """下载音频文件"""
-        response = requests.get(url, stream=True, headers={
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
-        response.raise_for_status()
-        
-        with open(save_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+    def _download_audio(
+        self,
+        url: str,
+        save_path: str,
+        progress: Optional[Callable[[str, float], None]] = None,
+        transcode_path: Optional[str] = None
+    ) -> Dict:
+        """
+        流式下载音频文件，可同时转码出供转写使用的版本
+        
+        HTTP响应体按块写入播放用的文件，同时通过管道送进ffmpeg，
+        边下载边生成16kHz单声道低码率的转写版本，整集音频不会读入内存，
+        也不需要下载完再读一遍原文件做转码。连接中断时用 Range 请求断点续传。
+        
+        Args:
+            url: 音频URL
+            save_path: 播放用音频的保存路径
+            progress: 进度回调
+            transcode_path: 转写版本的输出路径，为None时只下载
+        
+        Returns:
+            下载统计 {"bytes", "sha1", "resumes", "elapsed", "peak_rss_mb", "transcode_path", "transcode_bytes"}，
+            转码失败时 transcode_path 为None
+        """
+        import hashlib
+        import resource
+        import subprocess
+        import tempfile
+        import time
+        
+        started = time.time()
+        # 每次下载写各自的临时文件，完成后原子替换，同一路径的并发下载不会互相写坏
+        part_path = f"{save_path}.{uuid.uuid4().hex[:8]}.part"
+        digest = hashlib.sha1()
+        downloaded = 0
+        total = 0
+        resumes = 0
+        
+        ffmpeg = None
+        ffmpeg_log = None
+        if transcode_path:
+            ffmpeg_log = tempfile.TemporaryFile()
+            try:
+                ffmpeg = subprocess.Popen(
+                    [
+                        "ffmpeg", "-y", "-loglevel", "error",
+                        "-i", "pipe:0",
+                        "-ac", "1",
+                        "-ar", "16000",
+                        "-b:a", "32k",
+                        transcode_path
+                    ],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=ffmpeg_log
+                )
+            except FileNotFoundError:
+                print("⚠️ 未找到ffmpeg，只下载不转码")
+                ffmpeg = None
+        
+        def feed_ffmpeg(chunk: bytes):
+            nonlocal ffmpeg
+            if not ffmpeg:
+                return
+            try:
+                ffmpeg.stdin.write(chunk)
+            except (BrokenPipeError, OSError):
+                # ffmpeg提前退出（例如格式不支持），继续下载，之后回退到原文件转写
+                print("⚠️ ffmpeg流式转码中断，将使用原文件转写")
+                ffmpeg.kill()
+                ffmpeg = None
+        
+        if progress:
+            progress("download", 0.0)
+        
+        try:
+            with open(part_path, "wb") as f:
+                while True:
+                    request_headers = {}
+                    if downloaded:
+                        request_headers['Range'] = f"bytes={downloaded}-"
+                    try:
+                        response = self.http.get(url, stream=True, headers=request_headers, timeout=60)
+                        response.raise_for_status()
+                        
+                        # 服务器不支持Range时会从头返回，跳过已经写过的字节
+                        skip = downloaded if downloaded and response.status_code != 206 else 0
+                        if not total:
+                            total = int(response.headers.get('Content-Length') or 0)
+                        
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            if not chunk:
+                                continue
+                            if skip:
+                                if len(chunk) <= skip:
+                                    skip -= len(chunk)
+                                    continue
+                                chunk = chunk[skip:]
+                                skip = 0
+                            f.write(chunk)
+                            digest.update(chunk)
+                            feed_ffmpeg(chunk)
+                            downloaded += len(chunk)
+                            # 每约1MB汇报一次进度
+                            if progress and total and downloaded % (1024 * 1024) < len(chunk):
+                                progress("download", min(downloaded / total, 1.0))
+                        break
+                    except (requests.exceptions.ConnectionError,
+                            requests.exceptions.ChunkedEncodingError,
+                            requests.exceptions.Timeout) as e:
+                        if resumes >= settings.download_max_resumes:
+                            raise Exception(f"音频下载失败（已续传{resumes}次）: {str(e)}")
+                        resumes += 1
+                        print(f"⚠️ 下载中断，从 {downloaded / 1024 / 1024:.1f} MB 处续传 ({resumes}/{settings.download_max_resumes})")
+            
+            os.replace(part_path, save_path)
+            
+            transcode_ok = False
+            if ffmpeg:
+                if progress:
+                    progress("transcode", 0.0)
+                ffmpeg.stdin.close()
+                transcode_ok = ffmpeg.wait() == 0
+                if not transcode_ok:
+                    ffmpeg_log.seek(0)
+                    print(f"⚠️ ffmpeg流式转码失败: {ffmpeg_log.read().decode(errors='ignore')[-300:]}")
+                elif progress:
+                    progress("transcode", 1.0)
+        except Exception:
+            if ffmpeg:
+                ffmpeg.kill()
+            for path in (part_path, transcode_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            raise
+        finally:
+            if ffmpeg_log:
+                ffmpeg_log.close()
+        
+        if transcode_path and not transcode_ok and os.path.exists(transcode_path):
+            os.remove(transcode_path)
+        
+        stats = {
+            "bytes": downloaded,
+            "sha1": digest.hexdigest(),
+            "resumes": resumes,
+            "elapsed": round(time.time() - started, 2),
+            # ru_maxrss在Linux上单位是KB
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "transcode_path": transcode_path if transcode_ok else None,
+            "transcode_bytes": os.path.getsize(transcode_path) if transcode_ok else 0
+        }
+        print(
+            f"📥 下载完成: {stats['bytes'] / 1024 / 1024:.1f} MB，用时 {stats['elapsed']}s，"
+            f"续传 {resumes} 次，转写版本 {stats['transcode_bytes'] / 1024 / 1024:.1f} MB，"
+            f"进程峰值内存 {stats['peak_rss_mb']} MB"
+        )
+        return stats
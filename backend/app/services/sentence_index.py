@@ -0,0 +1,129 @@
+"""
+句子索引
+按开始时间二分查找，回答"t1到t2之间的句子"和"第N页"查询，客户端只需拉取当前显示的窗口，
+不必每次传输整集成千上万条句子
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.transcript import Transcript
+
+
+class SentenceIndex:
+    def __init__(self, transcript: Transcript):
+        """
+        Args:
+            transcript: 按开始时间排序的句子
+        """
+        self.transcript = transcript
+        # 句子结束时间的前缀最大值：转写结果偶有重叠，用它保证二分查找的单调性
+        self.max_ends = np.maximum.accumulate(transcript.ends)
+
+    def __len__(self) -> int:
+        return len(self.transcript)
+
+    def range(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        与时间范围 [start, end] 有重叠的句子下标区间
+
+        Returns:
+            (first, last)，last不含；没有重叠的句子时 first == last
+        """
+        # 第一个可能在start之后结束的句子
+        first = int(np.searchsorted(self.max_ends, start, side="right"))
+        # 最后一个在end之前开始的句子
+        last = int(np.searchsorted(self.transcript.starts, end, side="left"))
+        if last <= first:
+            return first, first
+        return first, last
+
+    def page(self, page: int, page_size: int) -> Tuple[int, int]:
+        """
+        第page页（从0开始）的句子下标区间，last不含
+        """
+        first = min(max(page, 0) * page_size, len(self))
+        return first, min(first + page_size, len(self))
+
+    def locate(self, time: float) -> int:
+        """时间点所在（或之前最近）的句子下标，早于第一句时返回0"""
+        return max(int(np.searchsorted(self.transcript.starts, time, side="right")) - 1, 0)
+
+
+class SentenceIndexCache:
+    """
+    最近访问的单集的句子索引（LRU），未命中时通过loader从数据库加载
+
+    同一单集被很多学习者同时浏览时只加载、只构建一次
+    """
+
+    def __init__(self, loader: Callable[[str], Optional[Transcript]], max_episodes: int = 32):
+        """
+        Args:
+            loader: episode_id -> 转写结果（单集不存在时返回None）
+            max_episodes: 缓存的单集数
+        """
+        self.loader = loader
+        self.max_episodes = max_episodes
+        self._indexes: "OrderedDict[str, SentenceIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 正在加载的单集各一把锁：并发未命中时只有一个请求加载，其他请求等它完成后直接用结果
+        self._loading: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, episode_id: str) -> Optional[SentenceIndex]:
+        with self._lock:
+            index = self._indexes.get(episode_id)
+            if index is not None:
+                self._indexes.move_to_end(episode_id)
+            return index
+
+    def get(self, episode_id: str) -> Optional[SentenceIndex]:
+        index = self._cached(episode_id)
+        if index is not None:
+            self.hits += 1
+            return index
+
+        with self._lock:
+            loading = self._loading.setdefault(episode_id, threading.Lock())
+        with loading:
+            # 等锁期间可能已由其他请求加载好
+            index = self._cached(episode_id)
+            if index is not None:
+                self.hits += 1
+                return index
+            self.misses += 1
+            try:
+                transcript = self.loader(episode_id)
+                if transcript is None:
+                    return None
+                index = SentenceIndex(transcript)
+                self.put(episode_id, index)
+                return index
+            finally:
+                with self._lock:
+                    if self._loading.get(episode_id) is loading:
+                        del self._loading[episode_id]
+
+    def put(self, episode_id: str, index: SentenceIndex):
+        with self._lock:
+            self._indexes[episode_id] = index
+            self._indexes.move_to_end(episode_id)
+            while len(self._indexes) > self.max_episodes:
+                self._indexes.popitem(last=False)
+
+    def invalidate(self, episode_id: str):
+        with self._lock:
+            self._indexes.pop(episode_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "episodes": len(self._indexes),
+                "max_episodes": self.max_episodes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,13 @@
+"""
+多个路由共用的服务实例
+在这里统一创建，路由模块之间不互相导入
+"""
+from app.services.database import Database
+from app.services.podcast_service import PodcastService
+from app.services.takeaway_index import TakeawayIndex
+
+# 整个进程共用一个数据库引擎和连接池
+database = Database()
+podcast_service = PodcastService()
+# 入库后在后台构建，反馈API按 单集 + 时间范围 查询
+takeaway_index = TakeawayIndex(podcast_service.groq_service)
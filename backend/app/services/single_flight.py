@@ -0,0 +1,98 @@
+"""
+并发请求合并（single-flight）
+同一身份的任务同时只执行一次：后到的请求不重复执行，等待正在执行的那一次并共用其结果
+"""
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+ProgressCallback = Callable[[str, float], None]
+
+
+class _Flight:
+    __slots__ = ("future", "listeners")
+
+    def __init__(self):
+        self.future: Future = Future()
+        self.listeners: List[ProgressCallback] = []
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def run(
+        self,
+        keys: Iterable[Optional[str]],
+        work: Callable[[ProgressCallback], T],
+        progress: Optional[ProgressCallback] = None
+    ) -> T:
+        """
+        执行任务；任意一个key已有任务在执行时，等待它的结果
+
+        Args:
+            keys: 任务的身份（同一任务可能有多个身份，None会被忽略）
+            work: 任务本身，参数为进度回调（会转发给所有等待者）
+            progress: 本次请求的进度回调
+
+        Returns:
+            任务结果（等待者拿到的是同一个对象）
+
+        Raises:
+            任务抛出的异常（等待者收到同一个异常）
+        """
+        keys = [key for key in keys if key]
+        with self._lock:
+            flight = next((self._flights[key] for key in keys if key in self._flights), None)
+            if flight is not None:
+                if progress:
+                    flight.listeners.append(progress)
+                self.followers += 1
+                leader = False
+            else:
+                flight = _Flight()
+                if progress:
+                    flight.listeners.append(progress)
+                for key in keys:
+                    self._flights[key] = flight
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            print("⏳ 同一单集正在处理中，等待其结果")
+            return flight.future.result()
+
+        def report(stage: str, fraction: float):
+            with self._lock:
+                listeners = list(flight.listeners)
+            for listener in listeners:
+                try:
+                    listener(stage, fraction)
+                except Exception:
+                    pass
+
+        try:
+            result = work(report)
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                for key in keys:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": len({id(flight) for flight in self._flights.values()}),
+                "leaders": self.leaders,
+                "followers": self.followers
+            }
@@ -0,0 +1,198 @@
+"""
+流式语音识别
+客户端边说边发送短音频帧（16位PCM），服务端做语音活动检测（VAD），
+说话过程中定期对已收到的音频做增量识别并推送中间结果，检测到说完（尾部静音）后自动结束本轮
+"""
+import asyncio
+import io
+import wave
+from typing import Awaitable, Callable, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# VAD的帧长（毫秒）
+FRAME_MS = 30
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """给16位单声道PCM加上WAV头（内存中完成），识别服务据此解析采样率"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class StreamingRecognizer:
+    """
+    单个会话的流式识别状态
+
+    - 能量VAD：每30ms一帧计算RMS，高于 max(最小阈值, 噪声基线 × 倍数) 视为有声，
+      噪声基线在静音帧上滑动更新，适应不同的麦克风底噪
+    - 中间结果：说话期间每 vad_partial_interval_ms 对整段已收音频识别一次（同一时刻最多一次）
+    - 结束检测：有声之后连续静音超过 vad_endpoint_silence_ms，或单句超过最长时长
+    - 如果最后一次中间结果已经覆盖到最后一个有声帧，直接作为最终结果，不再重新识别
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[bytes], Awaitable[str]],
+        on_partial: Callable[[str], Awaitable[None]],
+        on_final: Callable[[str], Awaitable[None]],
+        sample_rate: int = 16000
+    ):
+        """
+        Args:
+            transcribe: 识别函数，输入WAV字节，返回文本
+            on_partial: 收到中间结果时回调
+            on_final: 一句话结束时回调（文本可能为空）
+            sample_rate: 客户端音频帧的采样率
+        """
+        self.transcribe = transcribe
+        self.on_partial = on_partial
+        self.on_final = on_final
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.endpoint_samples = sample_rate * settings.vad_endpoint_silence_ms // 1000
+        self.partial_samples = sample_rate * settings.vad_partial_interval_ms // 1000
+        self.max_samples = sample_rate * settings.vad_max_utterance_seconds
+        # 句首保留的静音（避免切掉第一个音节）
+        self.preroll_samples = sample_rate * 300 // 1000
+
+        self.noise_floor: Optional[float] = None
+        self.utterance_id = 0
+        self.tasks = set()
+        self._reset()
+
+    def _reset(self):
+        self.pcm = bytearray()
+        self.vad_position = 0  # 已做过VAD的样本数
+        self.speech_started = False
+        self.last_speech_sample = 0  # 最后一个有声帧的结束位置
+        self.last_partial_sample = 0  # 上一次中间识别开始时的样本数
+        self.partial_task: Optional[asyncio.Task] = None
+        self.partial_text = ""
+        self.partial_covers = 0  # partial_text对应的样本数
+        self.utterance_id += 1
+
+    @property
+    def samples(self) -> int:
+        return len(self.pcm) // 2
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _is_voiced(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+        threshold = settings.vad_min_rms
+        if self.noise_floor is not None:
+            threshold = max(threshold, self.noise_floor * settings.vad_noise_ratio)
+        voiced = rms > threshold
+        if not voiced:
+            self.noise_floor = rms if self.noise_floor is None else 0.95 * self.noise_floor + 0.05 * rms
+        return voiced
+
+    def _run_vad(self):
+        # 只解码完整的样本：帧的字节数为奇数时，多出的一个字节留给下一帧
+        samples = np.frombuffer(bytes(self.pcm[self.vad_position * 2:self.samples * 2]), dtype=np.int16)
+        for start in range(0, len(samples) - self.frame_samples + 1, self.frame_samples):
+            frame_end = self.vad_position + start + self.frame_samples
+            if self._is_voiced(samples[start:start + self.frame_samples]):
+                self.speech_started = True
+                self.last_speech_sample = frame_end
+        processed = (len(samples) // self.frame_samples) * self.frame_samples
+        self.vad_position += processed
+
+    def feed(self, chunk: bytes):
+        """
+        喂入一帧音频（16位小端单声道PCM）
+
+        不会等待识别完成：中间识别和最终识别都在后台任务中进行
+        """
+        self.pcm.extend(chunk)
+        self._run_vad()
+
+        if not self.speech_started:
+            # 还没开口：只保留最近一小段静音，丢弃其余部分
+            excess = self.vad_position - self.preroll_samples
+            if excess > 0:
+                del self.pcm[:excess * 2]
+                self.vad_position -= excess
+            return
+
+        silence = self.vad_position - self.last_speech_sample
+        if silence >= self.endpoint_samples or self.samples >= self.max_samples:
+            self.finish()
+            return
+
+        if (self.samples - self.last_partial_sample >= self.partial_samples
+                and (self.partial_task is None or self.partial_task.done())):
+            self.last_partial_sample = self.samples
+            self.partial_task = self._spawn(
+                self._run_partial(self.utterance_id, bytes(self.pcm[:self.samples * 2]), self.samples)
+            )
+
+    def finish(self):
+        """
+        结束当前这句话（检测到尾部静音或客户端发送 audio_end）
+
+        当前状态立即重置，之后收到的音频帧属于下一句
+        """
+        if not self.speech_started:
+            self._reset()
+            return
+
+        # 保留最后一个有声帧之后的一小段（约200ms）尾音
+        end = min(self.samples, self.last_speech_sample + self.sample_rate // 5)
+        pcm = bytes(self.pcm[:end * 2])
+        snapshot = (self.partial_task, self.partial_text, self.partial_covers, self.last_speech_sample)
+        # 半个样本属于下一帧的开头，保留下来以免之后的样本错位
+        odd_byte = self.pcm[self.samples * 2:]
+        self._reset()
+        self.pcm.extend(odd_byte)
+        self._spawn(self._finalize(pcm, *snapshot))
+
+    async def _run_partial(self, utterance_id: int, pcm: bytes, covers: int) -> Tuple[str, int]:
+        try:
+            text = (await self.transcribe(pcm_to_wav(pcm, self.sample_rate))).strip()
+        except Exception as e:
+            print(f"⚠️ 中间识别失败: {e}")
+            return "", 0
+        if utterance_id == self.utterance_id:
+            self.partial_text, self.partial_covers = text, covers
+            if text:
+                await self.on_partial(text)
+        return text, covers
+
+    async def _finalize(
+        self,
+        pcm: bytes,
+        partial_task: Optional[asyncio.Task],
+        partial_text: str,
+        partial_covers: int,
+        last_speech_sample: int
+    ):
+        text, covers = partial_text, partial_covers
+        if partial_task is not None:
+            text, covers = await partial_task
+
+        # 中间结果没有覆盖到最后一个有声帧时才需要再识别一次
+        if not text or covers < last_speech_sample:
+            try:
+                text = (await self.transcribe(pcm_to_wav(pcm, self.sample_rate))).strip()
+            except Exception as e:
+                print(f"⚠️ 语音识别失败: {e}")
+                text = ""
+
+        await self.on_final(text)
+
+    def close(self):
+        for task in list(self.tasks):
+            task.cancel()
@@ -0,0 +1,253 @@
+"""
+播客Takeaways索引
+单集转写完成后，在后台按文本窗口（约2500字符）逐段提取值得复述的句子，按时间范围保存；
+生成反馈时按 单集ID + 片段时间范围 直接查表，LLM调用不再出现在用户等待的路径上
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+# 索引格式版本，格式变化时提升版本号，旧索引会重新构建
+INDEX_VERSION = 1
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9 ]", "", text.lower()).strip()
+
+
+def plan_windows(sentences: List[Dict], max_chars: int) -> List[Dict]:
+    """
+    把句子按顺序分组成文本窗口
+
+    Returns:
+        [{"start", "end", "first", "last"}, ...]，first/last为句子下标（含）
+    """
+    windows = []
+    first = 0
+    length = 0
+    for index, sentence in enumerate(sentences):
+        length += len(sentence["text"]) + 1
+        if length >= max_chars or index == len(sentences) - 1:
+            windows.append({
+                "start": sentences[first]["start"],
+                "end": sentence["end"],
+                "first": first,
+                "last": index
+            })
+            first = index + 1
+            length = 0
+    return windows
+
+
+def locate_takeaway(text: str, sentences: List[Dict], default: float) -> float:
+    """找到takeaway在原文中对应句子的开始时间，找不到时返回窗口起点"""
+    target = _normalize(text)[:40]
+    if not target:
+        return default
+    for sentence in sentences:
+        normalized = _normalize(sentence["text"])
+        if normalized and (target in normalized or normalized in target):
+            return sentence["start"]
+    return default
+
+
+class TakeawayIndex:
+    """
+    每个单集一个JSON文件：{index_dir}/{episode_id}.json
+        {"version", "episode_id", "windows": [{"start", "end", "status", "takeaways": [{"text", "start"}]}]}
+
+    - 每个窗口提取完立即落盘，构建到一半时已完成的时间范围就可以查询
+    - 失败的窗口在该单集下一次入库时重试
+    - 同一单集同一时间只有一个构建任务
+    """
+
+    def __init__(self, groq_service, index_dir: str = None, max_workers: int = None, max_loaded: int = None):
+        self.groq_service = groq_service
+        self.index_dir = index_dir or settings.takeaway_index_path
+        self.max_workers = max_workers or settings.takeaway_index_workers
+        self.max_loaded = max_loaded or settings.takeaway_index_max_loaded
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="takeaways")
+        self._lock = threading.Lock()
+        self._building = set()
+        # 已加载的索引（episode_id -> 索引内容），LRU，淘汰后需要时再从文件加载
+        self._indexes: "OrderedDict[str, Dict]" = OrderedDict()
+
+        self.windows_built = 0
+        self.windows_failed = 0
+        self.lookups = 0
+        self.lookup_hits = 0
+
+    def _path(self, episode_id: str) -> str:
+        return os.path.join(self.index_dir, f"{episode_id}.json")
+
+    def _remember(self, episode_id: str, index: Dict):
+        with self._lock:
+            self._indexes[episode_id] = index
+            self._indexes.move_to_end(episode_id)
+            while len(self._indexes) > self.max_loaded:
+                self._indexes.popitem(last=False)
+
+    def _load(self, episode_id: str) -> Optional[Dict]:
+        with self._lock:
+            index = self._indexes.get(episode_id)
+            if index is not None:
+                self._indexes.move_to_end(episode_id)
+                return index
+        try:
+            with open(self._path(episode_id), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get("version") != INDEX_VERSION:
+            return None
+        self._remember(episode_id, index)
+        return index
+
+    def _save(self, episode_id: str, index: Dict):
+        path = self._path(episode_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def schedule(self, episode_id: str, sentences: List[Dict]) -> bool:
+        """
+        在后台为单集构建索引（已完整构建或正在构建时直接返回）
+
+        Returns:
+            是否提交了新的构建任务
+        """
+        if not episode_id or not sentences:
+            return False
+        index = self._load(episode_id)
+        if index and all(w["status"] == "done" for w in index["windows"]):
+            return False
+        with self._lock:
+            if episode_id in self._building:
+                return False
+            self._building.add(episode_id)
+        self._executor.submit(self._build, episode_id, sentences)
+        return True
+
+    def _build(self, episode_id: str, sentences: List[Dict]):
+        started = time.time()
+        try:
+            existing = self._load(episode_id)
+            done = {}
+            if existing:
+                done = {
+                    (w["start"], w["end"]): w
+                    for w in existing["windows"] if w["status"] == "done"
+                }
+
+            windows = []
+            pending = []
+            for planned in plan_windows(sentences, settings.takeaway_window_chars):
+                window = done.get((planned["start"], planned["end"]))
+                if window is None:
+                    window = {
+                        "start": planned["start"],
+                        "end": planned["end"],
+                        "status": "pending",
+                        "takeaways": []
+                    }
+                    pending.append((window, planned["first"], planned["last"]))
+                windows.append(window)
+
+            index = {"version": INDEX_VERSION, "episode_id": episode_id, "windows": windows}
+            for window, first, last in pending:
+                window_sentences = sentences[first:last + 1]
+                try:
+                    texts = self.groq_service.extract_takeaways(
+                        " ".join(s["text"] for s in window_sentences)
+                    )
+                except Exception as e:
+                    print(f"⚠️ Takeaways提取失败 {episode_id} [{window['start']}-{window['end']}]: {e}")
+                    window["status"] = "failed"
+                    self.windows_failed += 1
+                else:
+                    window["takeaways"] = [
+                        {"text": text, "start": locate_takeaway(text, window_sentences, window["start"])}
+                        for text in texts
+                    ]
+                    window["status"] = "done"
+                    self.windows_built += 1
+
+                self._save(episode_id, index)
+                self._remember(episode_id, index)
+
+            print(f"✅ Takeaways索引完成: {episode_id}（{len(windows)}个窗口，{time.time() - started:.1f}秒）")
+        except Exception as e:
+            print(f"⚠️ Takeaways索引构建失败 {episode_id}: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(episode_id)
+
+    def lookup(self, episode_id: str, start: float, end: float, limit: int = 3) -> Optional[List[str]]:
+        """
+        查找时间范围内的Takeaways
+
+        只取落在范围内的句子（都不在范围内时才放宽到重叠窗口），与范围重叠最多的窗口排在前面，
+        各窗口轮流取一句以保证多样性
+
+        Returns:
+            句子列表；索引不存在或该范围还没有提取好时返回None
+        """
+        self.lookups += 1
+        index = self._load(episode_id) if episode_id else None
+        if not index:
+            return None
+
+        windows = [
+            w for w in index["windows"]
+            if w["status"] == "done" and w["start"] < end and w["end"] > start
+        ]
+        windows.sort(key=lambda w: (-(min(w["end"], end) - max(w["start"], start)), w["start"]))
+
+        candidates = [
+            [t["text"] for t in w["takeaways"] if start <= t["start"] <= end]
+            for w in windows
+        ]
+        if not any(candidates):
+            # 范围很短、落在范围内的句子都没被选中时，退而使用重叠窗口的全部句子
+            candidates = [[t["text"] for t in w["takeaways"]] for w in windows]
+
+        takeaways = []
+        seen = set()
+        depth = 0
+        while len(takeaways) < limit and any(depth < len(c) for c in candidates):
+            for texts in candidates:
+                if depth < len(texts) and len(takeaways) < limit:
+                    normalized = _normalize(texts[depth])
+                    if normalized not in seen:
+                        seen.add(normalized)
+                        takeaways.append(texts[depth])
+            depth += 1
+
+        if not takeaways:
+            return None
+        self.lookup_hits += 1
+        return takeaways
+
+    def stats(self) -> Dict:
+        with self._lock:
+            building = len(self._building)
+            loaded = len(self._indexes)
+        return {
+            "building": building,
+            "loaded": loaded,
+            "max_loaded": self.max_loaded,
+            "windows_built": self.windows_built,
+            "windows_failed": self.windows_failed,
+            "lookups": self.lookups,
+            "lookup_hits": self.lookup_hits
+        }
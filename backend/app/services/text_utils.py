@@ -0,0 +1,97 @@
+"""
+文本处理工具
+切句、关键词提取、按相关度裁剪长文本
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Optional
+
+# 句子边界：句末标点 + 空白
+SENTENCE_END = re.compile(r'(?<=[.!?。！？])["\')\]]*\s+')
+
+_WORD = re.compile(r"[a-z][a-z']+")
+
+_STOPWORDS = {
+    "the", "and", "that", "this", "with", "have", "for", "you", "your", "are", "was", "were",
+    "but", "not", "they", "them", "their", "what", "when", "where", "which", "who", "how",
+    "just", "like", "really", "about", "because", "there", "here", "then", "than", "from",
+    "into", "out", "all", "can", "could", "would", "should", "will", "been", "being", "its",
+    "it's", "i'm", "you're", "we're", "that's", "don't", "know", "think", "yeah", "okay",
+    "going", "gonna", "get", "got", "some", "very", "much", "more", "also", "one", "our",
+    "we", "she", "he", "his", "her", "him", "has", "had", "did", "does", "doing", "say",
+    "said", "today", "right", "well", "so", "if", "or", "of", "to", "in", "on", "at", "is",
+    "be", "it", "a", "an", "as", "by", "do", "my", "me", "us", "no", "yes", "too", "want",
+    "episode", "podcast", "english", "guys",
+}
+
+
+def split_sentences(text: str) -> List[str]:
+    """按句末标点切分文本"""
+    return [s.strip() for s in SENTENCE_END.split(text) if s.strip()]
+
+
+def extract_keywords(text: str, limit: int = 15) -> List[str]:
+    """
+    提取文本中反复出现的实词和词组，作为默认的"目标语言点"
+
+    Returns:
+        按出现次数排序的关键词（单词或双词词组）
+    """
+    words = _WORD.findall(text.lower())
+    counts = Counter(w for w in words if w not in _STOPWORDS and len(w) > 3)
+    # 双词词组（例如 "hang out"、"near my"），第二个词允许是虚词以覆盖短语动词
+    counts.update(
+        f"{a} {b}" for a, b in zip(words, words[1:])
+        if a not in _STOPWORDS and len(a) > 2
+    )
+    return [term for term, count in counts.most_common(limit * 2) if count >= 2][:limit]
+
+
+def trim_to_relevant(
+    text: str,
+    max_chars: int,
+    language_points: Optional[List[str]] = None
+) -> str:
+    """
+    把过长的文本裁剪到与目标语言点最相关的句子
+
+    - 不超过max_chars的文本原样返回
+    - 每句按包含的语言点计分（长句按长度开方折算），选分数最高的句子直到达到长度上限
+    - 选中的句子按原文顺序拼接
+    - 一句都放不下时（没有标点或单句过长），截取最相关的那一句的开头，不返回空文本
+
+    Args:
+        text: 原文
+        max_chars: 长度上限
+        language_points: 目标语言点（单词/短语），为空时自动提取关键词
+
+    Returns:
+        裁剪后的文本
+    """
+    if not max_chars or len(text) <= max_chars:
+        return text
+
+    sentences = split_sentences(text)
+    points = [p.lower().strip() for p in (language_points or extract_keywords(text)) if p.strip()]
+
+    def score(sentence: str) -> float:
+        lowered = sentence.lower()
+        hits = sum(lowered.count(point) for point in points)
+        return hits / math.sqrt(max(len(sentence), 1))
+
+    ranked = sorted(range(len(sentences)), key=lambda i: (-score(sentences[i]), i))
+    chosen = []
+    total = 0
+    for index in ranked:
+        length = len(sentences[index]) + 1
+        if total + length > max_chars:
+            continue
+        chosen.append(index)
+        total += length
+
+    if not chosen:
+        best = sentences[ranked[0]] if sentences else text
+        return best[:max_chars].rstrip()
+
+    return " ".join(sentences[i] for i in sorted(chosen))
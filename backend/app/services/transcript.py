@@ -0,0 +1,131 @@
+"""
+紧凑的转写结果表示
+开始/结束时间存成float32数组，全部句子文本拼成一个UTF-8缓冲区加偏移量数组，
+每集只占几个连续内存块，而不是每句一个dict；支持快速的二进制序列化，
+只在API边界才转换成 [{"text", "start", "end"}, ...] 形式
+"""
+import struct
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+# 二进制格式：魔数 + 版本 + 句子数 + 文本字节数，之后依次为 starts / ends / offsets / 文本
+_MAGIC = b"T2MT"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHxxII")
+
+
+class Transcript:
+    """
+    不可变的句子序列
+
+    兼容原有的句子列表用法：len()、迭代、下标（返回dict）、切片（返回dict列表）
+    """
+
+    __slots__ = ("starts", "ends", "offsets", "buffer")
+
+    def __init__(
+        self,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        offsets: np.ndarray,
+        buffer: Union[bytes, memoryview]
+    ):
+        """
+        Args:
+            starts: 每句开始时间（float32）
+            ends: 每句结束时间（float32）
+            offsets: 每句文本在buffer中的起点，长度为句子数+1（uint32）
+            buffer: 全部句子文本的UTF-8拼接
+        """
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.buffer = buffer
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict]) -> "Transcript":
+        """从 [{"text", "start", "end"}, ...] 构建"""
+        encoded = [s["text"].encode("utf-8") for s in segments]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        if encoded:
+            offsets[1:] = np.cumsum([len(e) for e in encoded])
+        return cls(
+            np.fromiter((s["start"] for s in segments), dtype=np.float32, count=len(segments)),
+            np.fromiter((s["end"] for s in segments), dtype=np.float32, count=len(segments)),
+            offsets,
+            b"".join(encoded)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Transcript":
+        """
+        从 to_bytes 的输出恢复（数组和文本直接引用data中的内存，不复制、不逐句解析）
+
+        Raises:
+            ValueError: 数据格式不正确
+        """
+        magic, version, count, text_size = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("不是有效的转写数据")
+        position = _HEADER.size
+        starts = np.frombuffer(data, dtype="<f4", count=count, offset=position)
+        position += 4 * count
+        ends = np.frombuffer(data, dtype="<f4", count=count, offset=position)
+        position += 4 * count
+        offsets = np.frombuffer(data, dtype="<u4", count=count + 1, offset=position)
+        position += 4 * (count + 1)
+        buffer = memoryview(data)[position:position + text_size]
+        if len(buffer) != text_size:
+            raise ValueError("转写数据不完整")
+        return cls(starts, ends, offsets, buffer)
+
+    def to_bytes(self) -> bytes:
+        """序列化成紧凑的二进制（小端）"""
+        return b"".join([
+            _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(self), len(self.buffer)),
+            self.starts.astype("<f4", copy=False).tobytes(),
+            self.ends.astype("<f4", copy=False).tobytes(),
+            self.offsets.astype("<u4", copy=False).tobytes(),
+            self.buffer
+        ])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text(self, index: int) -> str:
+        return str(self.buffer[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def _segment(self, index: int) -> Dict:
+        # float32转回时保留两位小数，与原来的时间戳精度一致
+        return {
+            "text": self.text(index),
+            "start": round(float(self.starts[index]), 2),
+            "end": round(float(self.ends[index]), 2)
+        }
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(key, slice):
+            return [self._segment(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("句子下标超出范围")
+        return self._segment(key)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self._segment(index)
+
+    def to_segments(self) -> List[Dict]:
+        """转换成 [{"text", "start", "end"}, ...]（API响应使用）"""
+        return self[:]
+
+    @property
+    def duration(self) -> float:
+        return round(float(self.ends[-1]), 2) if len(self) else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """数据占用的字节数（不含对象本身的固定开销）"""
+        return self.starts.nbytes + self.ends.nbytes + self.offsets.nbytes + len(self.buffer)
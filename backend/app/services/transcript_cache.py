@@ -0,0 +1,337 @@
+"""
+转写结果缓存
+按单集的稳定身份（苹果单集ID / enclosure URL / entry.id / 音频内容哈希）缓存转写结果，
+重复请求同一单集时直接返回，不再下载音频、不再调用Groq转写
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+from app.config import settings
+from app.services.transcript import Transcript
+
+# 缓存格式版本，格式变化时提升版本号，旧条目自动失效
+# 2: 句子以 Transcript 二进制（base64）保存
+CACHE_VERSION = 2
+
+
+def episode_identity(kind: str, value: str) -> Optional[str]:
+    """
+    构造单集身份字符串
+
+    Args:
+        kind: 身份类型（apple / enclosure / entry / content / url）
+        value: 身份值
+
+    Returns:
+        形如 "enclosure:https://..." 的身份字符串，value为空时返回None
+    """
+    if not value:
+        return None
+    return f"{kind}:{value}"
+
+
+def file_content_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """分块计算文件内容的sha1（不把整个文件读入内存）"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    持久化转写缓存
+
+    - 每个单集一个JSON文件：{cache_dir}/{key}.json
+    - 同一单集的其他身份以别名文件指向主key：{cache_dir}/aliases/{alias}
+    - 超过字节上限时按最近访问时间（LRU）淘汰，连同指向它的别名文件一起删除
+    - 失效规则：超过TTL、缓存版本不一致、对应的音频文件已不存在
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        max_bytes: int = None,
+        ttl_seconds: int = None
+    ):
+        self.cache_dir = cache_dir or settings.transcript_cache_path
+        self.alias_dir = os.path.join(self.cache_dir, "aliases")
+        self.max_bytes = max_bytes if max_bytes is not None else settings.transcript_cache_max_bytes
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.transcript_cache_ttl_seconds
+        os.makedirs(self.alias_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key -> 文件大小，按访问顺序排列（最久未访问的在前）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        # 主key -> 指向它的别名key，淘汰主条目时一并删除别名文件
+        self._aliases: Dict[str, Set[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # 命中时省下的音频秒数（Groq按音频时长计费）
+        self.saved_audio_seconds = 0.0
+
+        self._load_index()
+
+    @staticmethod
+    def _key(identity: str) -> str:
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _alias_path(self, key: str) -> str:
+        return os.path.join(self.alias_dir, key)
+
+    def _load_index(self):
+        """启动时扫描缓存目录，按修改时间（即最近访问时间）重建LRU顺序"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        for alias_key in os.listdir(self.alias_dir):
+            alias_path = self._alias_path(alias_key)
+            try:
+                with open(alias_path, "r", encoding="utf-8") as f:
+                    target = f.read().strip()
+            except OSError:
+                continue
+            if target in self._entries:
+                self._aliases.setdefault(target, set()).add(alias_key)
+            else:
+                # 主条目已不存在（例如旧版本淘汰时没有清理别名）
+                try:
+                    os.remove(alias_path)
+                except OSError:
+                    pass
+
+    def _resolve(self, identity: str) -> Optional[str]:
+        """身份 -> 主key（可能经过别名）"""
+        key = self._key(identity)
+        if key in self._entries:
+            return key
+        alias_path = self._alias_path(key)
+        if os.path.exists(alias_path):
+            try:
+                with open(alias_path, "r", encoding="utf-8") as f:
+                    target = f.read().strip()
+            except OSError:
+                return None
+            if target in self._entries:
+                return target
+            # 主条目已失效，清理悬空别名
+            try:
+                os.remove(alias_path)
+            except OSError:
+                pass
+        return None
+
+    def _remove(self, key: str):
+        self._remove_from_index(key)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+        for alias_key in self._aliases.pop(key, ()):
+            try:
+                os.remove(self._alias_path(alias_key))
+            except OSError:
+                pass
+
+    def _write_aliases(self, key: str, identities: Iterable[str]):
+        for identity in identities:
+            alias_key = self._key(identity)
+            if alias_key == key:
+                continue
+            with open(self._alias_path(alias_key), "w", encoding="utf-8") as f:
+                f.write(key)
+            self._aliases.setdefault(key, set()).add(alias_key)
+
+    def _is_valid(self, data: Dict) -> bool:
+        if data.get("version") != CACHE_VERSION:
+            return False
+        if self.ttl_seconds and time.time() - data.get("created_at", 0) > self.ttl_seconds:
+            return False
+        audio_path = data.get("result", {}).get("audio_path")
+        if audio_path and not os.path.exists(audio_path):
+            return False
+        return True
+
+    def get(self, identities: Iterable[Optional[str]], record_miss: bool = True) -> Optional[Dict]:
+        """
+        按身份查找缓存的转写结果
+
+        Args:
+            identities: 候选身份列表，任意一个命中即返回（None会被忽略）
+            record_miss: 未命中时是否计入miss（同一请求的前置探测不重复计数）
+
+        Returns:
+            与 process_podcast_url 相同结构的结果字典，未命中返回None
+        """
+        with self._lock:
+            for identity in identities:
+                if not identity:
+                    continue
+                key = self._resolve(identity)
+                if not key:
+                    continue
+
+                path = self._entry_path(key)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    self._remove(key)
+                    continue
+
+                if not self._is_valid(data):
+                    self._remove(key)
+                    self.invalidations += 1
+                    continue
+
+                # 刷新LRU顺序与文件修改时间（重启后据此恢复顺序）
+                self._entries.move_to_end(key)
+                try:
+                    os.utime(path, None)
+                except OSError:
+                    pass
+
+                result = data["result"]
+                result["sentences"] = Transcript.from_bytes(base64.b64decode(result["sentences"]))
+                self.hits += 1
+                self.saved_audio_seconds += float(result.get("duration") or 0)
+                return result
+
+            if record_miss:
+                self.misses += 1
+            return None
+
+    def contains(self, identities: Iterable[Optional[str]]) -> bool:
+        """是否已缓存（只查索引，不读取转写内容，也不计入命中/未命中）"""
+        with self._lock:
+            return any(identity and self._resolve(identity) for identity in identities)
+
+    def put(self, identities: Iterable[Optional[str]], result: Dict):
+        """
+        写入转写结果
+
+        Args:
+            identities: 该单集的所有身份，第一个作为主key，其余写成别名
+            result: process_podcast_url 的结果字典，写入时补上 episode_id（即主key）
+        """
+        identities = [i for i in identities if i]
+        if not identities:
+            return
+
+        key = self._key(identities[0])
+        result.setdefault("episode_id", key)
+        if not isinstance(result["sentences"], Transcript):
+            result["sentences"] = Transcript.from_segments(result["sentences"])
+        stored = dict(result)
+        stored["sentences"] = base64.b64encode(result["sentences"].to_bytes()).decode("ascii")
+        payload = json.dumps({
+            "version": CACHE_VERSION,
+            "created_at": time.time(),
+            "identities": identities,
+            "result": stored
+        }, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            path = self._entry_path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+            self._remove_from_index(key)
+            self._entries[key] = len(payload)
+            self._total_bytes += len(payload)
+
+            self._write_aliases(key, identities[1:])
+
+            self.stores += 1
+            self._evict()
+
+    def alias(self, identities: Iterable[Optional[str]], target: str) -> bool:
+        """
+        把新发现的身份登记为已缓存单集的别名（只写别名文件，不重复写入转写内容）
+
+        Args:
+            identities: 该单集的其他身份
+            target: 已缓存的身份
+
+        Returns:
+            target 未缓存（例如刚好被淘汰）时返回False
+        """
+        with self._lock:
+            key = self._resolve(target)
+            if not key:
+                return False
+            self._write_aliases(key, [i for i in identities if i])
+            return True
+
+    def _remove_from_index(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """超过字节上限时淘汰最久未访问的条目（至少保留最新写入的一条）"""
+        while self.max_bytes and self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, identity: str) -> bool:
+        """
+        手动使某个单集的缓存失效
+
+        Returns:
+            是否删除了条目
+        """
+        with self._lock:
+            key = self._resolve(identity)
+            if not key:
+                return False
+            self._remove(key)
+            self.invalidations += 1
+            return True
+
+    def stats(self) -> Dict:
+        """缓存统计（命中率、省下的转写时长等）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "saved_audio_seconds": round(self.saved_audio_seconds, 2)
+            }
@@ -2,47 +2,185 @@
 OpenAI TTS Service
 用于生成高质量的AI语音
 """
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from app.config import settings
+from app.services.text_utils import SENTENCE_END
+from collections import OrderedDict
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
 import os
+import threading
 import uuid
 
+class SentenceSplitter:
+    """
+    增量切句：流式文本逐段喂入，凑成完整句子就吐出
+    
+    过短的句子（例如 "Oh!"）会和下一句合并，避免为几个字单独请求一次TTS
+    """
+
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self.buffer += delta
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        # 剩下的部分可能还没说完，留在缓冲区
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
 class TTSService:
     def __init__(self):
         self.api_key = settings.openai_api_key
         self.base_url = settings.openai_base_url
+        self.model = "tts-1"
+        self.audio_dir = "storage/audio/tts"
+        os.makedirs(self.audio_dir, exist_ok=True)
+
+        # 语音缓存：相同 (文本, 声音, 模型) 直接复用已有文件
+        # 文件名 -> 大小，按访问顺序排列（最久未访问的在前）
+        self.cache_max_bytes = settings.tts_cache_max_bytes
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self._load_cache_index()
+
         if self.api_key:
             self.client = OpenAI(
                 api_key=self.api_key,
                 base_url=self.base_url if self.base_url else None
             )
+            self.async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url if self.base_url else None
+            )
         else:
             self.client = None
+            self.async_client = None
             print("Warning: OPENAI_API_KEY not found, TTS will be disabled")
 
+    def _load_cache_index(self):
+        """启动时扫描语音目录，按修改时间重建LRU顺序（包括旧版本生成的uuid文件）"""
+        files = []
+        for name in os.listdir(self.audio_dir):
+            if name.startswith("tts_") and name.endswith(".tmp"):
+                # 上次异常退出时没写完的临时文件
+                try:
+                    os.remove(os.path.join(self.audio_dir, name))
+                except OSError:
+                    pass
+                continue
+            if not (name.startswith("tts_") and name.endswith(".mp3")):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.audio_dir, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._cache[name] = size
+            self._cache_bytes += size
+        self._evict()
+
+    def _cache_filename(self, text: str, voice: str) -> str:
+        key = hashlib.sha256(f"{self.model}\0{voice}\0{text}".encode("utf-8")).hexdigest()[:32]
+        return f"tts_{key}.mp3"
+
+    def _cache_lookup(self, filename: str) -> bool:
+        """命中时刷新LRU顺序"""
+        with self._cache_lock:
+            if filename in self._cache and os.path.exists(os.path.join(self.audio_dir, filename)):
+                self._cache.move_to_end(filename)
+                try:
+                    os.utime(os.path.join(self.audio_dir, filename), None)
+                except OSError:
+                    pass
+                self.cache_hits += 1
+                return True
+            self.cache_misses += 1
+            return False
+
+    def _cache_store(self, filename: str, audio: bytes):
+        """写入语音文件（先写临时文件再改名，避免被读到半个文件）并按字节上限淘汰"""
+        file_path = os.path.join(self.audio_dir, filename)
+        # 每次写入用各自的临时文件：同一句话同时合成时不会互相截断，后完成的改名直接覆盖
+        tmp_path = f"{file_path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, file_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._cache_lock:
+            old_size = self._cache.pop(filename, None)
+            if old_size is not None:
+                self._cache_bytes -= old_size
+            self._cache[filename] = len(audio)
+            self._cache_bytes += len(audio)
+            self._evict()
+
+    def _evict(self):
+        while self.cache_max_bytes and self._cache_bytes > self.cache_max_bytes and len(self._cache) > 1:
+            filename, size = self._cache.popitem(last=False)
+            self._cache_bytes -= size
+            self.cache_evictions += 1
+            try:
+                os.remove(os.path.join(self.audio_dir, filename))
+            except OSError:
+                pass
+
+    def cache_stats(self) -> Dict:
+        """语音缓存统计"""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "files": len(self._cache),
+                "bytes": self._cache_bytes,
+                "max_bytes": self.cache_max_bytes,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.cache_evictions
+            }
+
+    async def _request_speech(self, text: str, voice: str) -> bytes:
+        response = await self.async_client.audio.speech.create(
+            model=self.model,
+            voice=voice,  # 使用指定的声音
+            input=text
+        )
+        return response.content
+
     async def generate_speech(self, text: str, voice: str = "nova") -> str:
         """
-        生成语音文件并返回相对路径
+        生成语音文件并返回相对路径（相同文本和声音直接返回缓存的文件）
         """
         if not self.client:
             return None
 
         try:
-            # 确保目录存在
-            audio_dir = "storage/audio/tts"
-            os.makedirs(audio_dir, exist_ok=True)
-
-            # 生成唯一文件名
-            filename = f"tts_{uuid.uuid4()}.mp3"
-            file_path = f"{audio_dir}/{filename}"
-
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,  # 使用指定的声音
-                input=text
-            )
-
-            response.stream_to_file(file_path)
+            filename = self._cache_filename(text, voice)
+            if not self._cache_lookup(filename):
+                audio = await self._request_speech(text, voice)
+                await asyncio.to_thread(self._cache_store, filename, audio)
             
             # 返回前端可访问的相对 URL
             # 注意：这里假设静态文件挂载在 /audio 下
@@ -53,3 +191,77 @@ class TTSService:
             import traceback
             traceback.print_exc()
             return None
+
+    async def synthesize(self, text: str, voice: str = "nova") -> bytes:
+        """
+        合成一段语音，直接返回MP3字节（命中缓存时从文件读取）
+        """
+        filename = self._cache_filename(text, voice)
+        if self._cache_lookup(filename):
+            def read_cached() -> Optional[bytes]:
+                try:
+                    with open(os.path.join(self.audio_dir, filename), "rb") as f:
+                        return f.read()
+                except OSError:
+                    # 刚好被淘汰
+                    return None
+            audio = await asyncio.to_thread(read_cached)
+            if audio is not None:
+                return audio
+
+        audio = await self._request_speech(text, voice)
+        await asyncio.to_thread(self._cache_store, filename, audio)
+        return audio
+
+    async def stream_speech(
+        self,
+        sentences: AsyncIterable[str],
+        voice: str = "nova"
+    ) -> AsyncIterator[Tuple[int, str, bytes]]:
+        """
+        分句流水线合成语音
+        
+        每收到一句就立即开始合成（最多 tts_pipeline_concurrency 句同时进行），
+        按句子顺序产出音频，第一句合成完就能开始播放
+        
+        Args:
+            sentences: 句子的异步序列（可以边生成回复边产出）
+            voice: 声音
+        
+        Yields:
+            (句子序号, 句子文本, MP3字节)
+        """
+        if not self.async_client:
+            async for _ in sentences:
+                pass
+            return
+
+        slots = asyncio.Semaphore(settings.tts_pipeline_concurrency)
+        pending: asyncio.Queue = asyncio.Queue()
+
+        async def synthesize_one(text: str) -> bytes:
+            async with slots:
+                return await self.synthesize(text, voice)
+
+        async def schedule():
+            async for sentence in sentences:
+                await pending.put((sentence, asyncio.create_task(synthesize_one(sentence))))
+            await pending.put(None)
+
+        scheduler = asyncio.create_task(schedule())
+        index = 0
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                sentence, task = item
+                yield index, sentence, await task
+                index += 1
+            await scheduler
+        finally:
+            scheduler.cancel()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item:
+                    item[1].cancel()
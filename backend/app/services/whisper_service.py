@@ -13,8 +13,24 @@ except ImportError:
         whisper = None
         USE_FASTER_WHISPER = None
 
-from typing import List, Dict
+from typing import List, Union
+import io
 import os
+import subprocess
+import time
+import wave
+
+import numpy as np
+
+from app.services.transcript import Transcript
+
+# Whisper模型的输入采样率
+SAMPLE_RATE = 16000
+# Whisper一次处理的最长音频（30秒）对应的特征帧数和采样点数
+N_FRAMES = 3000
+N_SAMPLES = N_FRAMES * 160
+# 批量解码失败后，多久再尝试一次（秒）
+BATCH_RETRY_SECONDS = 300
 
 # 设置ffmpeg路径（如果系统PATH中没有）
 _FFMPEG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'bin', 'ffmpeg')
@@ -51,18 +67,100 @@ def _load_whisper_model_with_ssl_fix(model_size: str):
         # 恢复原始opener
         urllib.request.urlopen = original_opener
 
+def _decode_wav(audio_data: bytes) -> np.ndarray:
+    """PCM WAV直接用标准库解析，不需要启动解码器"""
+    with wave.open(io.BytesIO(audio_data), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("仅支持16位PCM WAV")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(audio):
+        # 线性插值重采样（语音识别足够用）
+        target_length = int(len(audio) * SAMPLE_RATE / rate)
+        audio = np.interp(
+            np.linspace(0, len(audio) - 1, target_length),
+            np.arange(len(audio)),
+            audio
+        ).astype(np.float32)
+    return audio
+
+def decode_audio_bytes(audio_data: bytes) -> np.ndarray:
+    """
+    把内存中的音频（WAV / WebM / Opus / MP3等）解码成16kHz单声道float32数组
+    
+    - 16位PCM WAV：标准库直接解析
+    - 其他格式：优先用faster-whisper自带的PyAV解码器（进程内），否则通过管道交给ffmpeg
+    全程不写临时文件，多个会话并发调用互不影响
+    
+    Args:
+        audio_data: 音频文件的完整字节
+    
+    Returns:
+        float32数组，取值范围[-1, 1]
+    """
+    if audio_data[:4] == b"RIFF" and audio_data[8:12] == b"WAVE":
+        try:
+            return _decode_wav(audio_data)
+        except (ValueError, wave.Error):
+            pass  # 非PCM的WAV交给下面的通用解码器
+
+    if USE_FASTER_WHISPER:
+        from faster_whisper import decode_audio
+        return decode_audio(io.BytesIO(audio_data), sampling_rate=SAMPLE_RATE)
+
+    process = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "f32le",
+            "-ac", "1",
+            "-ar", str(SAMPLE_RATE),
+            "pipe:1"
+        ],
+        input=audio_data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False
+    )
+    if process.returncode != 0:
+        raise Exception(f"音频解码失败: {process.stderr.decode(errors='ignore')[-200:]}")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
 class WhisperService:
-    def __init__(self, model_size: str = "base"):
+    def __init__(
+        self,
+        model_size: str = "base",
+        num_workers: int = 1,
+        cpu_threads: int = 0,
+        beam_size: int = 5
+    ):
         """
         初始化Whisper模型
         
         Args:
             model_size: 模型大小 (tiny, base, small, medium, large)
+            num_workers: 模型副本数，多个线程同时调用时可以真正并行（仅faster-whisper）
+            cpu_threads: 每个副本使用的CPU线程数，0表示自动
+            beam_size: 解码的beam大小
         """
         self.model_size = model_size
+        self.beam_size = beam_size
+        # 批量解码失败时暂时回退到逐条识别，过一段时间再试（不永久关闭）
+        self._batch_retry_at = 0.0
         if USE_FASTER_WHISPER:
             # 使用faster-whisper（更快）
-            self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
+            self.model = WhisperModel(
+                model_size,
+                device="cpu",
+                compute_type="int8",
+                num_workers=num_workers,
+                cpu_threads=cpu_threads
+            )
             self.use_faster = True
         elif whisper:
             # 使用openai-whisper（官方版本）- 延迟加载模型
@@ -72,7 +170,7 @@ class WhisperService:
             self.model = None
             self.use_faster = None
     
-    def transcribe(self, audio_path: str, language: str = "en") -> List[Dict]:
+    def transcribe(self, audio_path: str, language: str = "en") -> Transcript:
         """
         转录音频文件
         
@@ -81,7 +179,7 @@ class WhisperService:
             language: 语言代码（en=英语）
         
         Returns:
-            句子列表，每个包含 text, start, end
+            转写结果（Transcript），每句包含 text, start, end
         """
         try:
             if self.use_faster:
@@ -89,7 +187,7 @@ class WhisperService:
                 segments, info = self.model.transcribe(
                     audio_path,
                     language=language,
-                    beam_size=5
+                    beam_size=self.beam_size
                 )
                 
                 sentences = []
@@ -114,7 +212,7 @@ class WhisperService:
                         "end": round(segment["end"], 2)
                     })
             
-            return sentences
+            return Transcript.from_segments(sentences)
         except Exception as e:
             raise Exception(f"Whisper转写错误: {str(e)}")
     
@@ -129,31 +227,112 @@ class WhisperService:
         Returns:
             识别出的文本
         """
-        # 保存临时文件
-        temp_path = "/tmp/temp_audio.wav"
-        with open(temp_path, "wb") as f:
-            f.write(audio_data)
+        # 在内存中解码，不落盘
+        return self._transcribe_array(decode_audio_bytes(audio_data), language)
+    
+    def _transcribe_array(self, audio: np.ndarray, language: str = "en") -> str:
+        if not len(audio):
+            return ""
+        
+        if self.use_faster:
+            # faster-whisper API
+            segments, _ = self.model.transcribe(
+                audio,
+                language=language,
+                beam_size=self.beam_size
+            )
+            # 合并所有segments
+            text = " ".join([segment.text.strip() for segment in segments])
+        else:
+            # openai-whisper API - 延迟加载模型
+            if self.model is None:
+                print("正在加载Whisper模型（首次使用会下载模型，需要一些时间）...")
+                self.model = _load_whisper_model_with_ssl_fix(self.model_size)
+            result = self.model.transcribe(audio, language=language)
+            text = result["text"].strip()
         
+        return text
+    
+    def _transcribe_one(self, audio: np.ndarray, language: str) -> Union[str, Exception]:
         try:
-            if self.use_faster:
-                # faster-whisper API
-                segments, _ = self.model.transcribe(
-                    temp_path,
-                    language=language,
-                    beam_size=5
-                )
-                # 合并所有segments
-                text = " ".join([segment.text.strip() for segment in segments])
+            return self._transcribe_array(audio, language)
+        except Exception as e:
+            return e
+    
+    def transcribe_batch(self, audio_list: List[bytes], language: str = "en") -> List[Union[str, Exception]]:
+        """
+        批量实时语音识别（多个会话的语音一起解码）
+        
+        faster-whisper下，30秒以内的语音拼成一个batch，一次编码器前向 + 一次batch解码；
+        超过30秒的语音或其他后端逐条识别
+        
+        每段语音单独解码：某个会话的音频无法解码或识别失败时，只有这一项是异常，
+        不影响同一批中其他会话的结果
+        
+        Args:
+            audio_list: 多段音频数据（bytes）
+            language: 语言代码
+        
+        Returns:
+            与输入顺序一致的列表，每项是识别文本，或该项失败时的异常
+        """
+        results: List[Union[str, Exception]] = [""] * len(audio_list)
+        audios = {}
+        for index, audio_data in enumerate(audio_list):
+            try:
+                audios[index] = decode_audio_bytes(audio_data)
+            except Exception as e:
+                results[index] = e
+        
+        batchable = []
+        for index, audio in audios.items():
+            if not len(audio):
+                continue
+            if self.use_faster and time.time() >= self._batch_retry_at and len(audio) <= N_SAMPLES:
+                batchable.append(index)
             else:
-                # openai-whisper API - 延迟加载模型
-                if self.model is None:
-                    print("正在加载Whisper模型（首次使用会下载模型，需要一些时间）...")
-                    self.model = _load_whisper_model_with_ssl_fix(self.model_size)
-                result = self.model.transcribe(temp_path, language=language)
-                text = result["text"].strip()
-            
-            return text
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+                results[index] = self._transcribe_one(audio, language)
+        
+        if len(batchable) == 1:
+            results[batchable[0]] = self._transcribe_one(audios[batchable[0]], language)
+        elif batchable:
+            try:
+                batch_texts = self._generate_batch([audios[i] for i in batchable], language)
+                for index, text in zip(batchable, batch_texts):
+                    results[index] = text
+            except Exception as e:
+                print(f"⚠️ Whisper批量解码失败，{BATCH_RETRY_SECONDS}秒内改为逐条识别: {e}")
+                self._batch_retry_at = time.time() + BATCH_RETRY_SECONDS
+                for index in batchable:
+                    results[index] = self._transcribe_one(audios[index], language)
+        
+        return results
+    
+    def _generate_batch(self, audios: List[np.ndarray], language: str) -> List[str]:
+        """faster-whisper底层接口：补齐到30秒后批量编码、批量解码（不带时间戳）"""
+        from faster_whisper.tokenizer import Tokenizer
+        
+        model = self.model
+        tokenizer = Tokenizer(
+            model.hf_tokenizer,
+            model.model.is_multilingual,
+            task="transcribe",
+            language=language
+        )
+        # 先自己补齐到30秒再提取特征，截取前3000帧：
+        # feature_extractor的默认补齐随版本变化（1.0补30秒静音，1.1起只补160个采样点），不依赖它
+        features = np.stack([
+            model.feature_extractor(np.pad(audio, (0, N_SAMPLES - len(audio))))[:, :N_FRAMES]
+            for audio in audios
+        ])
+        encoder_output = model.encode(features)
+        prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+        results = model.model.generate(
+            encoder_output,
+            [prompt] * len(audios),
+            beam_size=self.beam_size,
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=[-1]
+        )
+        return [tokenizer.decode(result.sequences_ids[0]).strip() for result in results]
@@ -0,0 +1,193 @@
+"""
+对话轮次延迟压测
+
+启动一个本地的模拟LLM服务（兼容Groq/OpenAI的 /openai/v1/chat/completions，固定延迟返回），
+把后端的 groq_base_url 指向它，然后分别以 1 / 10 / 50 个并发会话连接 /ws/conversation，
+统计每轮（发送消息 -> 收到 ai_message）的 p50 / p95 延迟。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.conversation_latency
+    python -m benchmarks.conversation_latency --sessions 1 10 50 --turns 5 --llm-latency 0.3
+    python -m benchmarks.conversation_latency --audio sample.wav   # 每轮改为发送语音，包含ASR耗时
+    python -m benchmarks.conversation_latency --stream   # 流式回复，额外统计首个文本片段的延迟
+
+参考结果（1核容器，默认参数：模拟LLM首token延迟300ms、逐词间隔20ms，每会话5轮文字输入，非流式）:
+
+    sessions   改为异步之前 p50 / p95 (ms)   改为异步之后 p50 / p95 (ms)
+           1          487 / 488                    495 / 501
+          10         4861 / 4881                   543 / 581
+          50     超时（阻塞事件循环，websocket心跳断开）   797 / 922
+
+    改为异步之前每次LLM调用都阻塞事件循环，所有会话的轮次串行，吞吐量固定在约1.7轮/秒；
+    之后50个会话时约50轮/秒。流式回复（--stream）时首个文本片段的p50为 311 / 355 / 770 ms
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import threading
+import time
+
+STUB_PORT = 18765
+APP_PORT = 18766
+
+SEGMENT_TEXT = (
+    "Today we're talking about the difference between near and nearby. "
+    "You can say the gym is near my house, or there's a gym nearby."
+)
+
+
+def _start_server(app, port: int):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+STUB_REPLY = "Oh nice, is the gym nearby? Tell me more!"
+
+
+def _build_stub_llm(latency: float, token_interval: float):
+    """模拟LLM：固定延迟后返回一句回复；stream=True时首个片段在延迟后到达，之后逐词返回"""
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    stub = FastAPI()
+
+    async def stream_chunks(model: str):
+        await asyncio.sleep(latency)
+        for word in STUB_REPLY.split(" "):
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(token_interval)
+        yield "data: [DONE]\n\n"
+
+    @stub.post("/openai/v1/chat/completions")
+    async def chat_completions(body: dict):
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(body.get("model", "stub")), media_type="text/event-stream")
+        await asyncio.sleep(latency + token_interval * len(STUB_REPLY.split(" ")))
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": STUB_REPLY},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+    return stub
+
+
+async def _session(url: str, turns: int, audio_base64: str, stream: bool, latencies: list, first_text: list):
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "init", "segment_text": SEGMENT_TEXT, "stream": stream}))
+        await _wait_ai_message(ws)
+
+        for i in range(turns):
+            if audio_base64:
+                payload = {"type": "user_audio", "audio": audio_base64}
+            else:
+                payload = {"type": "user_message", "text": f"I go to gym near, turn {i}."}
+            started = time.perf_counter()
+            await ws.send(json.dumps(payload))
+            first = await _wait_ai_message(ws)
+            latencies.append(time.perf_counter() - started)
+            first_text.append(first - started)
+
+
+async def _wait_ai_message(ws) -> float:
+    """等待完整的 ai_message，返回收到第一段文本（delta或完整消息）的时间"""
+    first = None
+    while True:
+        message = json.loads(await ws.recv())
+        if first is None and message["type"] in ("ai_message_delta", "ai_message"):
+            first = time.perf_counter()
+        if message["type"] == "ai_message":
+            return first
+        if message["type"] == "error":
+            raise RuntimeError(message["message"])
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _run_level(sessions: int, turns: int, audio_base64: str, stream: bool) -> dict:
+    latencies = []
+    first_text = []
+    url = f"ws://127.0.0.1:{APP_PORT}/ws/conversation"
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _session(url, turns, audio_base64, stream, latencies, first_text) for _ in range(sessions)
+    ])
+    elapsed = time.perf_counter() - started
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "first_text_p50_ms": statistics.median(first_text) * 1000,
+        "turns_per_s": len(latencies) / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话轮次延迟压测")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--turns", type=int, default=5, help="每个会话的轮数（不含欢迎语）")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="模拟LLM的首个token延迟（秒）")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="模拟LLM逐词输出的间隔（秒）")
+    parser.add_argument("--stream", action="store_true", help="使用流式回复（ai_message_delta）")
+    parser.add_argument("--audio", help="每轮发送的语音文件（WAV），不指定则发送文字")
+    args = parser.parse_args()
+
+    # 必须在导入后端之前设置：LLM指向本地模拟服务，关闭TTS
+    os.environ["GROQ_API_KEY"] = "stub"
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+    os.environ["OPENAI_API_KEY"] = ""
+
+    from main import app
+
+    _start_server(_build_stub_llm(args.llm_latency, args.token_interval), STUB_PORT)
+    _start_server(app, APP_PORT)
+
+    audio_base64 = None
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            audio_base64 = base64.b64encode(f.read()).decode()
+
+    print(f"模拟LLM延迟: {args.llm_latency * 1000:.0f} ms，每会话 {args.turns} 轮，"
+          f"{'语音' if audio_base64 else '文字'}输入，{'流式' if args.stream else '非流式'}回复")
+    print(f"{'sessions':>8} {'turns':>6} {'p50(ms)':>9} {'p95(ms)':>9} {'max(ms)':>9} "
+          f"{'first-text p50':>15} {'turns/s':>8}")
+    for sessions in args.sessions:
+        row = asyncio.run(_run_level(sessions, args.turns, audio_base64, args.stream))
+        print(f"{row['sessions']:>8} {row['turns']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+              f"{row['max_ms']:>9.1f} {row['first_text_p50_ms']:>15.1f} {row['turns_per_s']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+转写结果内存占用对比
+
+用合成的单集（约每小时900句，句长与真实播客相近）比较两种表示：
+- 原来的句子列表：每句一个 {"text", "start", "end"} dict（模拟从JSON缓存读出的状态）
+- Transcript：float32时间数组 + 单个文本缓冲区 + 偏移量数组
+
+统计每集常驻内存（tracemalloc）、序列化大小，以及从缓存加载的耗时。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.transcript_memory
+    python -m benchmarks.transcript_memory --hours 0.5 1 3 --repeat 20
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from app.services.transcript import Transcript
+
+SENTENCES_PER_HOUR = 900
+
+WORDS = (
+    "so I think that the really important thing here is when you hang out with "
+    "friends nearby you can actually pick up a lot of natural expressions and "
+    "connection not perfection is what we always say on the show right"
+).split()
+
+
+def make_segments(hours: float, seed: int = 0):
+    rng = random.Random(seed)
+    segments = []
+    position = 0.0
+    for _ in range(int(hours * SENTENCES_PER_HOUR)):
+        length = rng.uniform(1.5, 6.5)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 22))).capitalize() + "."
+        segments.append({"text": text, "start": round(position, 2), "end": round(position + length, 2)})
+        position += length + rng.uniform(0.05, 0.6)
+    return segments
+
+
+def measure(build):
+    """返回 (对象, 构建后仍占用的字节数)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def timed(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="转写结果内存占用对比")
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1, 3], help="单集时长（小时）")
+    parser.add_argument("--repeat", type=int, default=10, help="加载耗时的重复次数")
+    args = parser.parse_args()
+
+    header = (
+        f"{'时长':>6} {'句子数':>7} │ {'dict列表':>10} {'Transcript':>11} {'节省':>6} │ "
+        f"{'JSON':>9} {'二进制':>9} │ {'json.loads':>11} {'from_bytes':>11}"
+    )
+    print(header)
+    print("─" * len(header))
+
+    for hours in args.hours:
+        encoded_json = json.dumps(make_segments(hours))
+        segments, list_bytes = measure(lambda: json.loads(encoded_json))
+        transcript, transcript_bytes = measure(lambda: Transcript.from_segments(segments))
+        assert transcript.to_segments() == segments
+
+        binary = transcript.to_bytes()
+        load_json_ms = timed(lambda: json.loads(encoded_json), args.repeat)
+        load_binary_ms = timed(lambda: Transcript.from_bytes(binary), args.repeat)
+
+        print(
+            f"{hours:>5}h {len(segments):>7} │ "
+            f"{list_bytes / 1024:>8.0f}KB {transcript_bytes / 1024:>9.0f}KB {list_bytes / transcript_bytes:>5.1f}x │ "
+            f"{len(encoded_json) / 1024:>7.0f}KB {len(binary) / 1024:>7.0f}KB │ "
+            f"{load_json_ms:>9.2f}ms {load_binary_ms:>9.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
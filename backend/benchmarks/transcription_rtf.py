@@ -0,0 +1,109 @@
+"""
+本地转写引擎的实时率（RTF）对比
+
+用同一段音频比较不同 模型 / 精度 / beam / 进程数 × 线程数 组合的转写速度。
+RTF = 转写耗时 / 音频时长，越小越快（0.1 表示1小时的音频6分钟转完）。
+进程池启动和模型加载在计时之前完成（每个进程先转写一小段预热），只统计稳态吞吐量。
+
+用法（在 backend 目录下，需要安装 faster-whisper 和 ffmpeg）:
+    python -m benchmarks.transcription_rtf episode.mp3
+    python -m benchmarks.transcription_rtf episode.mp3 --models base small --beams 1 5 \\
+        --layouts 1x8 2x4 4x2 8x1 --limit 600
+"""
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Tuple
+
+from app.services.audio_utils import extract_chunk, probe_duration
+from app.services.local_transcriber import LocalTranscriber, _transcribe_chunk
+
+WARMUP_SECONDS = 10
+
+
+def parse_layout(layout: str) -> Tuple[int, int]:
+    """"4x2" -> (4进程, 每进程2线程)"""
+    workers, threads = layout.lower().split("x")
+    return int(workers), int(threads)
+
+
+def default_layouts() -> List[str]:
+    cores = os.cpu_count() or 1
+    layouts = {f"1x{cores}", f"{cores}x1"}
+    if cores >= 4:
+        layouts.add(f"{cores // 2}x2")
+    return sorted(layouts, key=lambda layout: parse_layout(layout)[0])
+
+
+def warm_up(transcriber: LocalTranscriber, audio_path: str):
+    """让每个进程都完成模型加载"""
+    executor = transcriber._pool()
+    futures = [
+        executor.submit(_transcribe_chunk, audio_path, 0.0, WARMUP_SECONDS, transcriber.beam_size, "en")
+        for _ in range(transcriber.workers)
+    ]
+    for future in futures:
+        future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地转写引擎的实时率对比")
+    parser.add_argument("audio", help="测试用的音频文件")
+    parser.add_argument("--models", nargs="+", default=["base", "small"], help="模型大小")
+    parser.add_argument("--compute-types", nargs="+", default=["int8"], help="计算精度")
+    parser.add_argument("--beams", type=int, nargs="+", default=[1, 5], help="beam大小")
+    parser.add_argument("--layouts", nargs="+", default=None, help="进程数x线程数，例如 4x2（默认按核数生成）")
+    parser.add_argument("--limit", type=float, default=0, help="只转写音频的前N秒（0表示整段）")
+    args = parser.parse_args()
+
+    temp_dir = None
+    audio_path = args.audio
+    if args.limit:
+        temp_dir = tempfile.mkdtemp(prefix="talk2me_rtf_")
+        audio_path = os.path.join(temp_dir, "clip.mp3")
+        extract_chunk(args.audio, 0.0, args.limit, audio_path)
+    duration = probe_duration(audio_path)
+    layouts = args.layouts or default_layouts()
+
+    print(f"音频时长 {duration / 60:.1f} 分钟，CPU核数 {os.cpu_count()}")
+    header = (
+        f"{'模型':>10} {'精度':>8} {'beam':>5} {'进程x线程':>10} │ "
+        f"{'耗时':>8} {'RTF':>7} {'倍速':>7} {'句子数':>7}"
+    )
+    print(header)
+    print("─" * len(header))
+
+    try:
+        for model, compute_type, beam, layout in itertools.product(
+            args.models, args.compute_types, args.beams, layouts
+        ):
+            workers, threads = parse_layout(layout)
+            transcriber = LocalTranscriber(
+                model_size=model,
+                compute_type=compute_type,
+                beam_size=beam,
+                cpu_threads=threads,
+                workers=workers
+            )
+            try:
+                warm_up(transcriber, audio_path)
+                started = time.perf_counter()
+                transcript = transcriber.transcribe_audio(audio_path)
+                elapsed = time.perf_counter() - started
+            finally:
+                transcriber.close()
+
+            print(
+                f"{model:>10} {compute_type:>8} {beam:>5} {layout:>10} │ "
+                f"{elapsed:>7.1f}s {elapsed / duration:>7.3f} {duration / elapsed:>6.1f}x {len(transcript):>7}"
+            )
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,17 @@ app.include_router(podcast.router, prefix="/api/podcast", tags=["podcast"])
 app.include_router(conversation.router, tags=["conversation"])
 app.include_router(feedback.router, prefix="/api/feedback", tags=["feedback"])
 
+@app.on_event("startup")
+async def start_feed_watcher():
+    # 后台预处理订阅feed中的新单集（未配置 FEED_WATCH_URLS 时不启动）
+    podcast.feed_watcher.start()
+
+@app.on_event("shutdown")
+async def stop_feed_watcher():
+    podcast.feed_watcher.stop()
+    # 关闭本地转写进程池等后台资源
+    podcast.podcast_service.close()
+
 # 静态文件服务（音频文件）
 os.makedirs("storage/audio", exist_ok=True)
 app.mount("/audio", StaticFiles(directory="storage/audio"), name="audio")
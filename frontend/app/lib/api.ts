@@ -17,7 +17,12 @@ export async function processPodcast(url: string) {
   return response.json();
 }
 
-export async function generateFeedback(conversationId: string, segmentText: string, conversationHistory: any[] = []) {
+export async function generateFeedback(
+  conversationId: string,
+  segmentText: string,
+  conversationHistory: any[] = [],
+  segment?: { episode_id?: string; start: number; end: number }
+) {
   const response = await fetch(`${API_BASE_URL}/api/feedback/generate`, {
     method: "POST",
     headers: {
@@ -26,7 +31,11 @@ export async function generateFeedback(conversationId: string, segmentText: stri
     body: JSON.stringify({
       conversation_id: conversationId,
       segment_text: segmentText,
-      conversation_history: conversationHistory
+      conversation_history: conversationHistory,
+      // 后端据此直接查询入库时预先提取的Takeaways
+      episode_id: segment?.episode_id,
+      segment_start: segment?.start,
+      segment_end: segment?.end
     }),
   });
 
@@ -37,3 +46,35 @@ export async function generateFeedback(conversationId: string, segmentText: stri
 
   return response.json();
 }
+
+export async function fetchEpisode(episodeId: string) {
+  const response = await fetch(`${API_BASE_URL}/api/podcast/episodes/${episodeId}`);
+
+  if (!response.ok) {
+    const data = await response.json();
+    throw new Error(data.detail || "获取单集失败");
+  }
+
+  return response.json();
+}
+
+// 按时间范围（秒）或分页获取句子，只拉取当前显示的窗口
+export async function fetchSentences(
+  episodeId: string,
+  query: { start?: number; end?: number; page?: number; pageSize?: number } = {}
+) {
+  const params = new URLSearchParams();
+  if (query.start !== undefined) params.set("start", String(query.start));
+  if (query.end !== undefined) params.set("end", String(query.end));
+  if (query.page !== undefined) params.set("page", String(query.page));
+  if (query.pageSize !== undefined) params.set("page_size", String(query.pageSize));
+
+  const response = await fetch(`${API_BASE_URL}/api/podcast/episodes/${episodeId}/sentences?${params}`);
+
+  if (!response.ok) {
+    const data = await response.json();
+    throw new Error(data.detail || "获取句子失败");
+  }
+
+  return response.json();
+}
@@ -52,7 +52,8 @@ export default function PracticePage() {
       end: podcast.sentences[podcast.sentences.length - 1].end,
       // Ideally backend uses sentences for context. 
       // For compatibility, we verify what `Segment` type expects.
-      sentences: podcast.sentences
+      sentences: podcast.sentences,
+      episode_id: podcast.episode_id
     };
 
     // 保存数据到localStorage并跳转
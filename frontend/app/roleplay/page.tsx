@@ -395,7 +395,7 @@ export default function RolePlayPage() {
           text: m.text
         }));
 
-      const feedback = await generateFeedback(conversationId, segmentText, history);
+      const feedback = await generateFeedback(conversationId, segmentText, history, segment);
 
       localStorage.setItem("feedback", JSON.stringify(feedback));
       router.push("/feedback");
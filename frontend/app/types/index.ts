@@ -9,12 +9,14 @@ export interface Podcast {
   audio_url: string;
   sentences: Sentence[];
   duration: number;
+  episode_id?: string;
 }
 
 export interface Segment {
   start: number;
   end: number;
   sentences: Sentence[];
+  episode_id?: string;
 }
 
 export interface ConversationMessage {